@@ -0,0 +1,38 @@
+"""company_order_stats
+
+Revision ID: 7c2e91d4a0b6
+Revises: 15a0067971e8
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e91d4a0b6'
+down_revision: Union[str, None] = '15a0067971e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('company_order_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('company_id', 'estado', name='uq_company_order_stats_company_estado')
+    )
+    # Backfill desde las órdenes existentes
+    op.execute(
+        "INSERT INTO company_order_stats (company_id, estado, total) "
+        "SELECT COALESCE(company_id, 0), estado, COUNT(*) FROM service_orders GROUP BY COALESCE(company_id, 0), estado"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('company_order_stats')
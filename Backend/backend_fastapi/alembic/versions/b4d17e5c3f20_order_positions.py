@@ -0,0 +1,42 @@
+"""order_positions
+
+Revision ID: b4d17e5c3f20
+Revises: 7c2e91d4a0b6
+Create Date: 2026-10-18 10:48:02.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d17e5c3f20'
+down_revision: Union[str, None] = '7c2e91d4a0b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('order_positions',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('lat', sa.Numeric(precision=10, scale=6), nullable=False),
+    sa.Column('lng', sa.Numeric(precision=10, scale=6), nullable=False),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('event_id', sa.Integer(), nullable=True),
+    sa.Column('recorded_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['service_orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('order_id')
+    )
+    # Backfill: último evento de ubicación con coordenadas por orden
+    op.execute(
+        "INSERT INTO order_positions (order_id, lat, lng, message, event_id, recorded_at) "
+        "SELECT e.order_id, e.lat, e.lng, e.message, e.id, e.created_at FROM order_events e "
+        "JOIN (SELECT MAX(id) AS id FROM order_events "
+        "WHERE tipo = 'ubicacion' AND lat IS NOT NULL AND lng IS NOT NULL GROUP BY order_id) lp ON lp.id = e.id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('order_positions')
@@ -0,0 +1,35 @@
+"""order_event_archives
+
+Revision ID: d91a6b2f7e45
+Revises: b4d17e5c3f20
+Create Date: 2026-10-18 11:36:54.207391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91a6b2f7e45'
+down_revision: Union[str, None] = 'b4d17e5c3f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('order_event_archives',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(length=300), nullable=False),
+    sa.Column('events', sa.Integer(), nullable=False),
+    sa.Column('first_event_id', sa.Integer(), nullable=False),
+    sa.Column('last_event_id', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['service_orders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('order_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('order_event_archives')
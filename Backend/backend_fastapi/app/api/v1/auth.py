@@ -1,7 +1,10 @@
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError
 from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.core import deps
@@ -11,6 +14,7 @@ from app.models.user import User
 from app.schemas.token import Token
 from app.models.auth import RevokedToken
 from app.schemas.user import UserRead
+from app.services.revocation import revocation_list
 
 
 router = APIRouter()
@@ -21,38 +25,56 @@ class TokenRefreshRequest(BaseModel):
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(deps.get_db),
 ) -> Token:
-    user: User | None = db.query(User).filter(User.email == form_data.username).one_or_none()
-    if user is None or not PasswordHelper.verify_password(form_data.password, user.hashed_password):
+    # async: la consulta va al threadpool y bcrypt al pool de hashing, sin retener un hilo
+    user: User | None = await run_in_threadpool(lambda: db.query(User).filter(User.email == form_data.username).one_or_none())
+    if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
+    valid, new_hash = await PasswordHelper.verify_and_update_async(form_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas")
+    # antes del commit: expire_on_commit vaciaría user y leerlo haría un SELECT en el event loop
+    principal = deps.Principal.from_user(user)
+    if new_hash:
+        # rehash transparente a la política vigente (esquema o costo cambiaron)
+        user.hashed_password = new_hash
+        await run_in_threadpool(db.commit)
 
     access_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     refresh_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
 
-    access_token = TokenManager.create_access_token(subject=user.email, expires_delta=access_expires)
-    refresh_token = TokenManager.create_refresh_token(subject=user.email, expires_delta=refresh_expires)
+    claims = principal.token_claims() if settings.TOKEN_EMBED_CLAIMS else None
+    access_token = TokenManager.create_access_token(subject=principal.email, expires_delta=access_expires, claims=claims)
+    refresh_token = TokenManager.create_refresh_token(subject=principal.email, expires_delta=refresh_expires)
 
-    return Token(access_token=access_token, refresh_token=refresh_token, token_type="bearer", role=user.role, company_id=user.company_id)
+    return Token(access_token=access_token, refresh_token=refresh_token, token_type="bearer", role=principal.role, company_id=principal.company_id)
 
 
 @router.post("/refresh", response_model=Token)
-def refresh_tokens(payload: TokenRefreshRequest) -> Token:
-    # Validar no revocado
-    token_hash = TokenManager.token_sha256(payload.refresh_token)
-    # Nota: refresh no requiere DB, pero para revocación consultamos
-    email = TokenManager.decode_refresh_token(payload.refresh_token)
+def refresh_tokens(payload: TokenRefreshRequest, db: Session = Depends(deps.get_db)) -> Token:
+    try:
+        email = TokenManager.decode_refresh_token(payload.refresh_token)
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token inválido")
+    # Validar no revocado (la base solo se consulta si el Bloom filter da positivo)
+    deps.ensure_refresh_not_revoked(payload.refresh_token, db)
+    # mismos claims que login: rol/empresa vigentes al momento del refresh
+    user = db.query(User).filter(User.email == email).one_or_none()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token inválido")
     access_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     refresh_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    access_token = TokenManager.create_access_token(subject=email, expires_delta=access_expires)
+    claims = deps.Principal.from_user(user).token_claims() if settings.TOKEN_EMBED_CLAIMS else None
+    access_token = TokenManager.create_access_token(subject=email, expires_delta=access_expires, claims=claims)
     refresh_token = TokenManager.create_refresh_token(subject=email, expires_delta=refresh_expires)
-    return Token(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
+    return Token(access_token=access_token, refresh_token=refresh_token, token_type="bearer", role=user.role, company_id=user.company_id)
 
 
 @router.get("/me", response_model=UserRead)
-def me(current_user: User = Depends(deps.get_current_user)) -> UserRead:
+def me(current_user: deps.Principal = Depends(deps.get_current_user)) -> UserRead:
     return UserRead.model_validate(current_user)
 
 
@@ -63,11 +85,20 @@ class LogoutRequest(BaseModel):
 @router.post("/logout")
 def logout(payload: LogoutRequest, db: Session = Depends(deps.get_db)) -> dict:
     # Guardar hash del refresh token para invalidarlo
+    try:
+        exp = TokenManager.decode_refresh_payload(payload.refresh_token)["exp"]
+    except JWTError:
+        # inválido o vencido: ya no sirve para refrescar, nada que revocar
+        return {"ok": True}
     token_hash = TokenManager.token_sha256(payload.refresh_token)
-    exists = db.query(RevokedToken).filter(RevokedToken.token_hash == token_hash).one_or_none()
-    if not exists:
-        db.add(RevokedToken(token_hash=token_hash))
-        db.commit()
+    if not revocation_list.is_revoked(db, token_hash):
+        # expires_at permite purgar la fila cuando el token ya no podría usarse
+        db.add(RevokedToken(token_hash=token_hash, expires_at=datetime.fromtimestamp(exp, tz=timezone.utc)))
+        try:
+            db.commit()
+        except IntegrityError:  # logout concurrente del mismo token
+            db.rollback()
+    revocation_list.add(token_hash)
     return {"ok": True}
 
 
@@ -1,42 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Callable, Hashable
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from app.core import deps
+from app.core.config import settings
 from app.models import catalogs as m
 from app.schemas import catalogs as s
 from app.models.company import Company
+from app.services.catalog_cache import catalog_cache
 
 router = APIRouter()
 
 
+def _cached_catalog(name: str, scope: Hashable, schema: type, load: Callable[[], list], if_none_match: str | None) -> Response:
+    # JSON pre-serializado en memoria; 304 si el cliente ya tiene la versión
+    entry = catalog_cache.get_or_build(name, scope, lambda: TypeAdapter(list[schema]).dump_json(load()))
+    headers = {"ETag": entry.etag, "Cache-Control": f"private, max-age={settings.CATALOG_MAX_AGE_SECONDS}"}
+    if if_none_match and entry.etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
 @router.get("/industries", response_model=list[s.IndustryRead])
-def list_industries(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(m.Industry).order_by(m.Industry.name).all()
+def list_industries(if_none_match: str | None = Header(None), db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return _cached_catalog("industries", None, s.IndustryRead, lambda: db.query(m.Industry).order_by(m.Industry.name).all(), if_none_match)
 
 
-@router.get("/vehicle_types", response_model=list[s.VehicleTypeRead])
-def list_vehicle_types(db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
-    q = db.query(m.VehicleType)
-    if current.role != "super_admin":
+def _load_vehicle_types(db: Session, company_id: int | None, all_companies: bool) -> list[s.VehicleTypeRead]:
+    # company_name por join: solo las empresas de las filas devueltas
+    q = db.query(m.VehicleType, Company.name).outerjoin(Company, Company.id == m.VehicleType.company_id)
+    if not all_companies:
         # Ver solo globales (company_id null) y los de su empresa
-        q = q.filter((m.VehicleType.company_id == None) | (m.VehicleType.company_id == current.company_id))  # noqa: E711
+        q = q.filter((m.VehicleType.company_id == None) | (m.VehicleType.company_id == company_id))  # noqa: E711
     rows = q.order_by(m.VehicleType.name).all()
-    # Enriquecer con company_name
-    company_map: dict[int, str] = {
-        c.id: c.name for c in db.query(Company).all()
-    }
     result: list[s.VehicleTypeRead] = []
-    for vt in rows:
+    for vt, company_name in rows:
         result.append(s.VehicleTypeRead(
             id=vt.id,
             name=vt.name,
             active=vt.active,
             company_id=vt.company_id,
-            company_name=company_map.get(vt.company_id) if vt.company_id else None,
+            company_name=company_name,
         ))
     return result
 
 
+@router.get("/vehicle_types", response_model=list[s.VehicleTypeRead])
+def list_vehicle_types(if_none_match: str | None = Header(None), db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+    all_companies = current.role == "super_admin"
+    scope = "all" if all_companies else current.company_id
+    return _cached_catalog("vehicle_types", scope, s.VehicleTypeRead, lambda: _load_vehicle_types(db, current.company_id, all_companies), if_none_match)
+
+
 @router.post("/vehicle_types", response_model=s.VehicleTypeRead, dependencies=[Depends(deps.require_roles("admin", "super_admin"))])
 def create_vehicle_type(payload: s.VehicleTypeCreate, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
     exists = db.query(m.VehicleType).filter(m.VehicleType.name == payload.name).one_or_none()
@@ -47,6 +64,7 @@ def create_vehicle_type(payload: s.VehicleTypeCreate, db: Session = Depends(deps
     vt = m.VehicleType(name=payload.name, active=payload.active, company_id=company_id)
     db.add(vt)
     db.commit()
+    catalog_cache.invalidate("vehicle_types")
     db.refresh(vt)
     return vt
 
@@ -65,6 +83,7 @@ def update_vehicle_type(vt_id: int, payload: s.VehicleTypeCreate, db: Session =
     vt.name = payload.name
     vt.active = payload.active
     db.commit()
+    catalog_cache.invalidate("vehicle_types")
     db.refresh(vt)
     company_name = None
     if vt.company_id:
@@ -82,29 +101,30 @@ def delete_vehicle_type(vt_id: int, db: Session = Depends(deps.get_db), current=
         raise HTTPException(status_code=403, detail="No permitido")
     db.delete(vt)
     db.commit()
+    catalog_cache.invalidate("vehicle_types")
     return {"ok": True}
 
 
 @router.get("/epp_items", response_model=list[s.EppItemRead])
-def list_epp_items(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(m.EppItem).order_by(m.EppItem.name).all()
+def list_epp_items(if_none_match: str | None = Header(None), db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return _cached_catalog("epp_items", None, s.EppItemRead, lambda: db.query(m.EppItem).order_by(m.EppItem.name).all(), if_none_match)
 
 
 @router.get("/medical_exams", response_model=list[s.MedicalExamRead])
-def list_medical_exams(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(m.MedicalExam).order_by(m.MedicalExam.name).all()
+def list_medical_exams(if_none_match: str | None = Header(None), db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return _cached_catalog("medical_exams", None, s.MedicalExamRead, lambda: db.query(m.MedicalExam).order_by(m.MedicalExam.name).all(), if_none_match)
 
 
 @router.get("/courses", response_model=list[s.CourseRead])
-def list_courses(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(m.Course).order_by(m.Course.name).all()
+def list_courses(if_none_match: str | None = Header(None), db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return _cached_catalog("courses", None, s.CourseRead, lambda: db.query(m.Course).order_by(m.Course.name).all(), if_none_match)
 
 
 @router.get("/cost_centers", response_model=list[s.CostCenterRead])
-def list_cost_centers(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(m.CostCenter).order_by(m.CostCenter.code).all()
+def list_cost_centers(if_none_match: str | None = Header(None), db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return _cached_catalog("cost_centers", None, s.CostCenterRead, lambda: db.query(m.CostCenter).order_by(m.CostCenter.code).all(), if_none_match)
 
 
 @router.get("/required_documents", response_model=list[s.RequiredDocumentRead])
-def list_required_documents(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(m.RequiredDocument).order_by(m.RequiredDocument.name).all()
+def list_required_documents(if_none_match: str | None = Header(None), db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return _cached_catalog("required_documents", None, s.RequiredDocumentRead, lambda: db.query(m.RequiredDocument).order_by(m.RequiredDocument.name).all(), if_none_match)
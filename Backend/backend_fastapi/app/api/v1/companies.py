@@ -4,6 +4,7 @@ from typing import List
 
 from app.core import deps
 from app.models.company import Company
+from app.services.catalog_cache import catalog_cache
 
 router = APIRouter(dependencies=[Depends(deps.require_roles("super_admin"))])
 
@@ -32,6 +33,8 @@ def delete_company(company_id: int, db: Session = Depends(deps.get_db)):
         raise HTTPException(status_code=404, detail="Empresa no encontrada")
     db.delete(comp)
     db.commit()
+    # vehicle_types de la empresa quedan globales (SET NULL)
+    catalog_cache.invalidate("vehicle_types")
     return {"ok": True}
 
 
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from app.core import deps
+from app.core.pagination import keyset_page, paginate
 from app.models import crm as m
 from app.schemas import crm as s
 
@@ -27,7 +28,7 @@ def create_client(payload: s.ClientCreate, db: Session = Depends(deps.get_db), c
 
 
 @router.get("/clientes", response_model=List[s.ClientRead])
-def list_clients(q: Optional[str] = None, page: int = 1, per_page: int = 20, company_id: Optional[int] = None, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+def list_clients(response: Response, q: Optional[str] = None, page: int = 1, per_page: int = 20, cursor: Optional[str] = None, company_id: Optional[int] = None, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
     query = db.query(m.Client)
     # scoping: super_admin puede pedir company_id; otros, su propia empresa
     if current.role == "super_admin" and company_id is not None:
@@ -37,7 +38,7 @@ def list_clients(q: Optional[str] = None, page: int = 1, per_page: int = 20, com
     if q:
         like = f"%{q}%"
         query = query.filter((m.Client.razon_social.ilike(like)) | (m.Client.nit.ilike(like)))
-    return query.order_by(m.Client.razon_social).offset((page-1)*per_page).limit(per_page).all()
+    return keyset_page(query, [(m.Client.razon_social, False), (m.Client.id, False)], cursor=cursor, page=page, per_page=per_page, response=response)
 
 
 @router.patch("/clientes/{client_id}", response_model=s.ClientRead)
@@ -101,7 +102,7 @@ def create_lead(payload: s.LeadCreate, db: Session = Depends(deps.get_db), _: ob
 
 
 @router.get("/leads", response_model=List[s.LeadRead])
-def list_leads(estado: Optional[str] = None, q: Optional[str] = None, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+def list_leads(response: Response, page: int = 1, per_page: int = 20, cursor: Optional[str] = None, stream: bool = False, estado: Optional[str] = None, q: Optional[str] = None, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
     query = db.query(m.Lead)
     if estado:
         query = query.filter(m.Lead.estado == estado)
@@ -109,7 +110,7 @@ def list_leads(estado: Optional[str] = None, q: Optional[str] = None, db: Sessio
     if q:
         like = f"%{q}%"
         query = query.filter(m.Lead.notas.ilike(like))
-    return query.order_by(m.Lead.id.desc()).all()
+    return paginate(query, [(m.Lead.id, True)], s.LeadRead, cursor=cursor, page=page, per_page=per_page, stream=stream, response=response)
 
 
 @router.patch("/leads/{lead_id}", response_model=s.LeadRead)
@@ -147,11 +148,11 @@ def create_opportunity(payload: s.OpportunityCreate, db: Session = Depends(deps.
 
 
 @router.get("/oportunidades", response_model=List[s.OpportunityRead])
-def list_opportunities(etapa: Optional[str] = None, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+def list_opportunities(response: Response, page: int = 1, per_page: int = 20, cursor: Optional[str] = None, stream: bool = False, etapa: Optional[str] = None, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
     query = db.query(m.Opportunity)
     if etapa:
         query = query.filter(m.Opportunity.etapa == etapa)
-    return query.order_by(m.Opportunity.id.desc()).all()
+    return paginate(query, [(m.Opportunity.id, True)], s.OpportunityRead, cursor=cursor, page=page, per_page=per_page, stream=stream, response=response)
 
 
 @router.patch("/oportunidades/{opp_id}", response_model=s.OpportunityRead)
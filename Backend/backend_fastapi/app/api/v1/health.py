@@ -1,4 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from app.core import deps
+from app.core.security import password_pool
 
 
 router = APIRouter()
@@ -9,3 +12,9 @@ def health_v1() -> dict:
     return {"status": "ok", "version": "v1"}
 
 
+@router.get("/password-hashing", dependencies=[Depends(deps.require_roles("super_admin"))])
+def password_hashing_stats() -> dict:
+    # profundidad de cola y latencia del pool de hashing
+    return password_pool.stats()
+
+
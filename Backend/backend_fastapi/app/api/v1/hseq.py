@@ -1,15 +1,21 @@
 from datetime import date, timedelta
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.orm import Session
 from typing import List
 
 from app.core import deps
+from app.core.pagination import paginate
 from app.models.hseq import EmployeeDoc, Induction, PreOpInspection, HseqEvent
 from app.models.ops import Operator
 from app.schemas import hseq as s
 
 router = APIRouter()
 
+DOC_ORDER = [(EmployeeDoc.id, True)]
+INDUCTION_ORDER = [(Induction.fecha, True), (Induction.id, True)]
+PREOP_ORDER = [(PreOpInspection.fecha, True), (PreOpInspection.id, True)]
+EVENT_ORDER = [(HseqEvent.fecha, True), (HseqEvent.id, True)]
+
 
 # Employee documents
 @router.post("/docs", response_model=s.EmployeeDocRead)
@@ -29,8 +35,8 @@ def create_doc(payload: s.EmployeeDocCreate, db: Session = Depends(deps.get_db),
 
 
 @router.get("/docs", response_model=List[s.EmployeeDocRead])
-def list_docs(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(EmployeeDoc).order_by(EmployeeDoc.id.desc()).all()
+def list_docs(response: Response, page: int = 1, per_page: int = 20, cursor: str | None = None, stream: bool = False, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return paginate(db.query(EmployeeDoc), DOC_ORDER, s.EmployeeDocRead, cursor=cursor, page=page, per_page=per_page, stream=stream, response=response)
 
 
 @router.get("/docs/vencimientos", response_model=List[s.EmployeeDocRead])
@@ -57,8 +63,8 @@ def create_induction(payload: s.InductionCreate, db: Session = Depends(deps.get_
 
 
 @router.get("/inductions", response_model=List[s.InductionRead])
-def list_inductions(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(Induction).order_by(Induction.fecha.desc()).all()
+def list_inductions(response: Response, page: int = 1, per_page: int = 20, cursor: str | None = None, stream: bool = False, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return paginate(db.query(Induction), INDUCTION_ORDER, s.InductionRead, cursor=cursor, page=page, per_page=per_page, stream=stream, response=response)
 
 
 # Pre-operational inspections
@@ -72,8 +78,8 @@ def create_preop(payload: s.PreOpInspectionCreate, db: Session = Depends(deps.ge
 
 
 @router.get("/preops", response_model=List[s.PreOpInspectionRead])
-def list_preops(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(PreOpInspection).order_by(PreOpInspection.fecha.desc()).all()
+def list_preops(response: Response, page: int = 1, per_page: int = 20, cursor: str | None = None, stream: bool = False, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return paginate(db.query(PreOpInspection), PREOP_ORDER, s.PreOpInspectionRead, cursor=cursor, page=page, per_page=per_page, stream=stream, response=response)
 
 
 # HSEQ events
@@ -87,8 +93,8 @@ def create_event(payload: s.HseqEventCreate, db: Session = Depends(deps.get_db),
 
 
 @router.get("/events", response_model=List[s.HseqEventRead])
-def list_events(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(HseqEvent).order_by(HseqEvent.fecha.desc()).all()
+def list_events(response: Response, page: int = 1, per_page: int = 20, cursor: str | None = None, stream: bool = False, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return paginate(db.query(HseqEvent), EVENT_ORDER, s.HseqEventRead, cursor=cursor, page=page, per_page=per_page, stream=stream, response=response)
 
 
 # HR - backgrounds by name or license id (simple contains)
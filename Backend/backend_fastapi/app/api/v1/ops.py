@@ -1,16 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, with_expression
 from typing import List
 
 from app.core import deps
+from app.core.cache import TTLCache
+from app.core.pagination import keyset_page, paginate
 from app.models import ops as mo
 from app.models.orders import ServiceOrder
 from app.models.user import User
 from app.models.catalogs import VehicleType
 from app.schemas import ops as s
+from app.services.assignments import AssignmentService
+from app.services.dashboard import DashboardService
+from app.services.dispatch import DispatchService
+from app.services.event_archive import EventArchiveService
+from app.services.fleet_index import fleet_index
+from app.services.geo import encode_polyline, simplify_track
+from app.services.pubsub import company_channel, get_pubsub, order_channel
+from app.services.tracking import QueueFullError, event_ingestor, publish_events, upsert_positions
 
 router = APIRouter()
 
+SSE_KEEPALIVE_SECONDS = 15.0
+MAX_EVENTS_PER_PAGE = 5000
+
+# (order_id, tolerance_m) -> OrderTrackRead; solo órdenes completadas (su ruta ya no cambia)
+_track_cache = TTLCache(maxsize=2048, ttl_seconds=24 * 3600)
+
 
 # Allies
 @router.post("/allies", response_model=s.AllyRead)
@@ -23,8 +43,8 @@ def create_ally(payload: s.AllyCreate, db: Session = Depends(deps.get_db), _: ob
 
 
 @router.get("/allies", response_model=List[s.AllyRead])
-def list_allies(db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(mo.Ally).order_by(mo.Ally.name).all()
+def list_allies(response: Response, page: int = 1, per_page: int = 20, cursor: str | None = None, stream: bool = False, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    return paginate(db.query(mo.Ally), [(mo.Ally.name, False), (mo.Ally.id, False)], s.AllyRead, cursor=cursor, page=page, per_page=per_page, stream=stream, response=response)
 
 
 # Vehicles
@@ -40,13 +60,16 @@ def create_vehicle(payload: s.VehicleCreate, db: Session = Depends(deps.get_db),
 
 
 @router.get("/vehicles", response_model=List[s.VehicleRead])
-def list_vehicles(page: int = 1, per_page: int = 20, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
-    q = db.query(mo.Vehicle)
+def list_vehicles(response: Response, page: int = 1, per_page: int = 20, cursor: str | None = None, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+    # tipo_nombre por join, solo para las filas de la página
+    q = (
+        db.query(mo.Vehicle)
+        .outerjoin(VehicleType, VehicleType.id == mo.Vehicle.tipo_id)
+        .options(with_expression(mo.Vehicle.tipo_nombre, VehicleType.name))
+    )
     if current.role != "super_admin":
         q = q.filter(mo.Vehicle.company_id == current.company_id)
-    items = q.order_by(mo.Vehicle.placa).offset((page-1)*per_page).limit(per_page).all()
-    # enrich tipo_nombre
-    types = {t.id: t.name for t in db.query(VehicleType).all()}
+    items = keyset_page(q, [(mo.Vehicle.placa, False)], cursor=cursor, page=page, per_page=per_page, response=response)
     result: list[s.VehicleRead] = []
     for v in items:
         result.append(s.VehicleRead(
@@ -58,8 +81,51 @@ def list_vehicles(page: int = 1, per_page: int = 20, db: Session = Depends(deps.
             odometro=v.odometro,
             gps_id=v.gps_id,
             active=v.active,
-            tipo_nombre=types.get(v.tipo_id),
+            tipo_nombre=v.tipo_nombre,
+        ))
+    return result
+
+
+@router.get("/vehicles/nearby", response_model=List[s.VehicleNearbyRead])
+def vehicles_nearby(lat: float, lng: float, radius_km: float = 10.0, k: int = 10, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+    # vehículos más cercanos según su última posición (índice en memoria)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise HTTPException(status_code=400, detail="Coordenadas inválidas")
+    radius_km = min(max(radius_km, 0.0), 500.0)
+    k = max(1, min(k, 100))
+    fleet_index.ensure_loaded(db)
+    hits = fleet_index.nearby(lat, lng, radius_km, k * 2 + 10, company_id=current.company_id, all_companies=current.role == "super_admin")
+    if not hits:
+        return []
+    rows = db.execute(
+        select(mo.Vehicle, mo.Operator.id, mo.Operator.nombre)
+        .outerjoin(mo.Operator, (mo.Operator.primary_vehicle_id == mo.Vehicle.id) & mo.Operator.active)
+        .where(mo.Vehicle.id.in_([pos.vehicle_id for pos, _ in hits]), mo.Vehicle.active)
+    ).all()
+    vehicles: dict[int, tuple] = {}
+    for v, op_id, op_nombre in rows:
+        vehicles.setdefault(v.id, (v, op_id, op_nombre))
+    result: list[s.VehicleNearbyRead] = []
+    for pos, dist in hits:
+        if pos.vehicle_id not in vehicles:
+            continue
+        v, op_id, op_nombre = vehicles[pos.vehicle_id]
+        result.append(s.VehicleNearbyRead(
+            vehicle_id=v.id,
+            placa=v.placa,
+            tipo_id=v.tipo_id,
+            propio=v.propio,
+            ally_id=v.ally_id,
+            operator_id=op_id,
+            operator_nombre=op_nombre,
+            order_id=pos.order_id,
+            lat=pos.lat,
+            lng=pos.lng,
+            distance_km=round(dist, 3),
+            recorded_at=pos.recorded_at,
         ))
+        if len(result) == k:
+            break
     return result
 
 
@@ -74,7 +140,7 @@ def create_operator(payload: s.OperatorCreate, db: Session = Depends(deps.get_db
 
 
 @router.get("/operators", response_model=List[s.OperatorRead])
-def list_operators(role: str | None = None, page: int = 1, per_page: int = 20, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+def list_operators(response: Response, role: str | None = None, page: int = 1, per_page: int = 20, cursor: str | None = None, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
     # join a users para scoping por company
     q = db.query(mo.Operator).join(User, mo.Operator.user_id == User.id, isouter=True)
     if role:
@@ -82,7 +148,7 @@ def list_operators(role: str | None = None, page: int = 1, per_page: int = 20, d
     # scope: por company via usuario relacionado (si lo tiene)
     if current.role != "super_admin":
         q = q.filter((User.company_id == current.company_id) | (mo.Operator.user_id == None))  # noqa: E711
-    items = q.order_by(mo.Operator.id.desc()).offset((page-1)*per_page).limit(per_page).all()
+    items = keyset_page(q, [(mo.Operator.id, True)], cursor=cursor, page=page, per_page=per_page, response=response)
     return items
 
 
@@ -103,25 +169,196 @@ def assign_order(order_id: int, payload: s.AssignmentCreate, db: Session = Depen
     asg = mo.Assignment(order_id=order_id, vehicle_id=payload.vehicle_id, operator_id=payload.operator_id, ally_id=payload.ally_id, turno=payload.turno, horas_conduccion=payload.horas_conduccion)
     db.add(asg)
     db.commit()
+    fleet_index.forget_orders([order_id])
     db.refresh(asg)
     return asg
 
 
+@router.post("/assignments:bulk", response_model=s.AssignmentBulkResult)
+def assign_orders_bulk(payload: s.AssignmentBulkCreate, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    # todo o nada: si alguna asignación falla la validación no se escribe ninguna
+    items = [a.model_dump() for a in payload.assignments]
+    errors, inferred = AssignmentService.create_bulk(db, items)
+    if errors:
+        db.rollback()
+        raise HTTPException(status_code=422, detail=errors)
+    db.commit()
+    order_ids = [it["order_id"] for it in items]
+    fleet_index.forget_orders(order_ids)
+    for company_id in set(inferred.values()):
+        DashboardService.invalidate(company_id)
+    return s.AssignmentBulkResult(created=len(items), order_ids=order_ids, company_inferred=len(inferred))
+
+
+@router.post("/dispatch:optimize", response_model=s.DispatchResult)
+def optimize_dispatch(payload: s.DispatchRequest, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+    # propuesta para las órdenes programadas sin vehículo; con commit=true se guarda como assignments:bulk
+    plan = DispatchService.plan(
+        db,
+        payload.turno,
+        payload.horas_por_orden,
+        payload.max_horas_conduccion,
+        company_id=current.company_id,
+        all_companies=current.role == "super_admin",
+    )
+    if not payload.commit or not plan.assignments:
+        return s.DispatchResult(assignments=plan.assignments, unassigned=plan.unassigned)
+    errors, inferred = AssignmentService.create_bulk(db, plan.assignments)
+    if errors:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=errors)
+    db.commit()
+    fleet_index.forget_orders([a["order_id"] for a in plan.assignments])
+    for company_id in set(inferred.values()):
+        DashboardService.invalidate(company_id)
+    return s.DispatchResult(assignments=plan.assignments, unassigned=plan.unassigned, committed=True)
+
+
 # Tracking
 @router.post("/orders/{order_id}/events", response_model=s.OrderEventRead)
 def add_event(order_id: int, payload: s.OrderEventCreate, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    if not db.query(ServiceOrder).get(order_id):
+    order = db.query(ServiceOrder).get(order_id)
+    if not order:
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     ev = mo.OrderEvent(order_id=order_id, tipo=payload.tipo, message=payload.message, lat=payload.lat, lng=payload.lng)
     db.add(ev)
+    db.flush()
+    row = {"id": ev.id, "order_id": order_id, "tipo": ev.tipo, "message": ev.message, "lat": ev.lat, "lng": ev.lng, "created_at": ev.created_at}
+    upsert_positions(db, [row])
     db.commit()
+    publish_events([row], {order_id: order.company_id})
+    fleet_index.feed(db, [row])
     db.refresh(ev)
     return ev
 
 
+@router.post("/orders/events:bulk", response_model=s.OrderEventBulkResult, status_code=202)
+def add_events_bulk(payload: s.OrderEventBulkCreate, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    # Valida todas las órdenes con un solo IN; la escritura la hace el flusher en micro-lotes
+    order_ids = {ev.order_id for ev in payload.events}
+    company_by_order = dict(db.execute(select(ServiceOrder.id, ServiceOrder.company_id).where(ServiceOrder.id.in_(order_ids))).all()) if order_ids else {}
+    known = set(company_by_order)
+    # company_id viaja con el evento: el flusher lo publica tras escribirlo, ya con id
+    rows = [
+        {"order_id": ev.order_id, "tipo": ev.tipo, "message": ev.message, "lat": ev.lat, "lng": ev.lng, "company_id": company_by_order[ev.order_id]}
+        for ev in payload.events
+        if ev.order_id in known
+    ]
+    try:
+        event_ingestor.enqueue(rows)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Cola de eventos llena, reintente")
+    return s.OrderEventBulkResult(accepted=len(rows), rejected_order_ids=sorted(order_ids - known))
+
+
 @router.get("/orders/{order_id}/events", response_model=List[s.OrderEventRead])
-def list_events(order_id: int, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    return db.query(mo.OrderEvent).filter(mo.OrderEvent.order_id == order_id).order_by(mo.OrderEvent.id).all()
+def list_events(
+    order_id: int,
+    response: Response,
+    since_id: int | None = None,
+    limit: int | None = None,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(deps.get_db),
+    _: object = Depends(deps.get_current_user),
+):
+    # ETag = último id de evento de la orden: si no hay eventos nuevos, 304 sin cuerpo
+    archive = EventArchiveService.get_record(db, order_id)
+    last_id = db.scalar(select(func.max(mo.OrderEvent.id)).where(mo.OrderEvent.order_id == order_id)) or 0
+    last_id = max(last_id, archive.last_event_id if archive else 0)
+    etag = f'"ev-{order_id}-{last_id}"'
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    # eventos archivados (si los hay) seguidos de los de la tabla caliente
+    archived = []
+    if archive and (since_id is None or since_id < archive.last_event_id):
+        archived = [ev for ev in EventArchiveService.archived_events(archive) if since_id is None or ev["id"] > since_id]
+    if limit is not None:
+        limit = max(1, min(limit, MAX_EVENTS_PER_PAGE))
+        archived = archived[:limit]
+        if len(archived) == limit:
+            return archived
+    q = db.query(mo.OrderEvent).filter(mo.OrderEvent.order_id == order_id)
+    if since_id is not None:
+        q = q.filter(mo.OrderEvent.id > since_id)
+    q = q.order_by(mo.OrderEvent.id)
+    if limit is not None:
+        q = q.limit(limit - len(archived))
+    return archived + q.all()
+
+
+@router.post("/events/archive", dependencies=[Depends(deps.require_roles("super_admin"))])
+def archive_events(older_than_days: int | None = None, max_orders: int = 500, db: Session = Depends(deps.get_db)) -> dict:
+    # Mueve a archivo comprimido los eventos de órdenes completadas hace más de N días
+    return EventArchiveService.run(db, older_than_days=older_than_days, max_orders=max_orders)
+
+
+# Live tracking (Server-Sent Events)
+def _sse(channel: str) -> StreamingResponse:
+    async def _events():
+        pubsub = get_pubsub()
+        queue = pubsub.subscribe(channel)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: order_event\ndata: {message}\n\n"
+        finally:
+            pubsub.unsubscribe(channel, queue)
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/orders/{order_id}/stream")
+def stream_order_events(order_id: int, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+    order = db.query(ServiceOrder).get(order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Orden no encontrada")
+    if current.role != "super_admin" and order.company_id != current.company_id:
+        raise HTTPException(status_code=403, detail="No permitido")
+    return _sse(order_channel(order_id))
+
+
+@router.get("/stream")
+def stream_company_events(company_id: int | None = None, current=Depends(deps.get_current_user)):
+    if current.role == "super_admin":
+        if company_id is None:
+            raise HTTPException(status_code=400, detail="company_id es obligatorio para super_admin")
+        return _sse(company_channel(company_id))
+    if current.company_id is None:
+        raise HTTPException(status_code=403, detail="Usuario sin empresa")
+    return _sse(company_channel(current.company_id))
+
+
+# Route track: polilínea simplificada de las posiciones de la orden
+@router.get("/orders/{order_id}/track", response_model=s.OrderTrackRead)
+def get_order_track(order_id: int, tolerance_m: float = 25.0, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    order = db.query(ServiceOrder).get(order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Orden no encontrada")
+    tolerance_m = max(tolerance_m, 0.0)
+    cache_key = (order_id, tolerance_m)
+    if order.estado == "completado":
+        cached = _track_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    rows = db.execute(
+        select(mo.OrderEvent.lat, mo.OrderEvent.lng)
+        .where(mo.OrderEvent.order_id == order_id, mo.OrderEvent.tipo == "ubicacion", mo.OrderEvent.lat != None, mo.OrderEvent.lng != None)  # noqa: E711
+        .order_by(mo.OrderEvent.id)
+    ).all()
+    archived = EventArchiveService.archived_events(EventArchiveService.get_record(db, order_id))
+    raw = [(ev["lat"], ev["lng"]) for ev in archived if ev["tipo"] == "ubicacion" and ev["lat"] is not None and ev["lng"] is not None]
+    raw += [(float(lat), float(lng)) for lat, lng in rows]
+    simplified = simplify_track(raw, tolerance_m)
+    track = s.OrderTrackRead(order_id=order_id, estado=order.estado, raw_points=len(raw), points=len(simplified), polyline=encode_polyline(simplified))
+    if order.estado == "completado":
+        _track_cache.set(cache_key, track)
+    return track
 
 
 # Order status update
@@ -132,18 +369,28 @@ def update_order_status(order_id: int, estado: str, db: Session = Depends(deps.g
         raise HTTPException(status_code=404, detail="Orden no encontrada")
     order.estado = estado
     db.commit()
+    DashboardService.invalidate(order.company_id)
     return {"ok": True, "order_id": order_id, "estado": estado}
 
 
-# Last GPS position from events
+# Last GPS position (order_positions, mantenida por add_event y la ingesta masiva)
 @router.get("/orders/{order_id}/last_position")
 def get_last_position(order_id: int, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
-    ev = (
-        db.query(mo.OrderEvent)
-        .filter(mo.OrderEvent.order_id == order_id, mo.OrderEvent.tipo == "ubicacion")
-        .order_by(mo.OrderEvent.id.desc())
-        .first()
-    )
-    if not ev or ev.lat is None or ev.lng is None:
+    pos = db.get(mo.OrderPosition, order_id)
+    if not pos:
         raise HTTPException(status_code=404, detail="Sin ubicación registrada")
-    return {"lat": float(ev.lat), "lng": float(ev.lng), "message": ev.message}
+    return {"lat": float(pos.lat), "lng": float(pos.lng), "message": pos.message}
+
+
+@router.get("/positions", response_model=List[s.OrderPositionRead])
+def get_positions(order_ids: str, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    # order_ids separados por coma: ?order_ids=1,2,3
+    try:
+        ids = {int(x) for x in order_ids.split(",") if x.strip()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="order_ids inválido")
+    if len(ids) > 1000:
+        raise HTTPException(status_code=400, detail="Máximo 1000 órdenes por consulta")
+    if not ids:
+        return []
+    return db.query(mo.OrderPosition).filter(mo.OrderPosition.order_id.in_(ids)).all()
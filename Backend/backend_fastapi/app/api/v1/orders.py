@@ -1,75 +1,41 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
 from typing import List
 
 from app.core import deps
+from app.core.pagination import keyset_page
 from app.models.orders import ServiceOrder
-from app.models.ops import Assignment
+from app.models.ops import Assignment, Operator
 from app.schemas.orders import OrderCardRead
 
 router = APIRouter()
 
 
+def _cards(db: Session):
+    # una fila por orden con su asignación vigente (la de mayor id), en una sola consulta
+    newer = aliased(Assignment)
+    current_id = select(func.max(newer.id)).where(newer.order_id == ServiceOrder.id).correlate(ServiceOrder).scalar_subquery()
+    return (
+        db.query(ServiceOrder.id, ServiceOrder.estado, Assignment.operator_id, Assignment.vehicle_id)
+        .outerjoin(Assignment, Assignment.id == current_id)
+    )
+
+
 @router.get("", response_model=List[OrderCardRead])
-def list_orders(status: str | None = None, page: int = 1, per_page: int = 20, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
-    q = db.query(ServiceOrder)
+def list_orders(response: Response, status: str | None = None, page: int = 1, per_page: int = 20, cursor: str | None = None, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+    q = _cards(db)
     if status in ("programado", "en_curso", "completado", "cancelado"):
         q = q.filter(ServiceOrder.estado == status)
     if current.role != "super_admin":
         q = q.filter(ServiceOrder.company_id == current.company_id)
-    orders = q.order_by(ServiceOrder.id.desc()).offset((page-1)*per_page).limit(per_page).all()
-    # mapa asignaciones (simple: última asignación por order)
-    asg_map = {}
-    if orders:
-        ids = [o.id for o in orders]
-        asg_rows = (
-            db.query(Assignment)
-            .filter(Assignment.order_id.in_(ids))
-            .all()
-        )
-        for a in asg_rows:
-            asg_map[a.order_id] = a
-    return [
-        OrderCardRead(
-            id=o.id,
-            estado=o.estado,
-            operator_id=asg_map.get(o.id).operator_id if asg_map.get(o.id) else None,
-            vehicle_id=asg_map.get(o.id).vehicle_id if asg_map.get(o.id) else None,
-        )
-        for o in orders
-    ]
+    return keyset_page(q, [(ServiceOrder.id, True)], cursor=cursor, page=page, per_page=per_page, response=response)
 
 
 @router.get("/me", response_model=List[OrderCardRead])
-def my_orders(status: str | None = None, page: int = 1, per_page: int = 20, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
-    # encontrar operator_id del usuario si existe
-    from app.models.ops import Operator
-    op = db.query(Operator).filter(Operator.user_id == current.id).one_or_none()
-    if not op:
-        return []
-    q = db.query(ServiceOrder).join(Assignment, Assignment.order_id == ServiceOrder.id).filter(Assignment.operator_id == op.id)
+def my_orders(response: Response, status: str | None = None, page: int = 1, per_page: int = 20, cursor: str | None = None, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+    # órdenes cuya asignación vigente es del operador vinculado al usuario
+    q = _cards(db).join(Operator, Operator.id == Assignment.operator_id).filter(Operator.user_id == current.id)
     if status in ("programado", "en_curso", "completado", "cancelado"):
         q = q.filter(ServiceOrder.estado == status)
-    orders = q.order_by(ServiceOrder.id.desc()).offset((page-1)*per_page).limit(per_page).all()
-    # devolver con operator/vehicle de la asignación
-    asg_map = {}
-    if orders:
-        ids = [o.id for o in orders]
-        asg_rows = (
-            db.query(Assignment)
-            .filter(Assignment.order_id.in_(ids))
-            .all()
-        )
-        for a in asg_rows:
-            asg_map[a.order_id] = a
-    return [
-        OrderCardRead(
-            id=o.id,
-            estado=o.estado,
-            operator_id=asg_map.get(o.id).operator_id if asg_map.get(o.id) else None,
-            vehicle_id=asg_map.get(o.id).vehicle_id if asg_map.get(o.id) else None,
-        )
-        for o in orders
-    ]
-
-
+    return keyset_page(q, [(ServiceOrder.id, True)], cursor=cursor, page=page, per_page=per_page, response=response)
@@ -1,16 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response
+from collections import Counter
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session, selectinload, with_expression
 from typing import List
 from datetime import datetime, timezone
 
 from app.core import deps
+from app.core.pagination import paginate
 from app.models import orders as mo
 from app.models.crm import Client, Lead
 from app.schemas import quotes as s
+from app.services.dashboard import DashboardService
 from app.services.pricing import PricingService
 
 router = APIRouter()
 
+IVA = Decimal("0.19")
+CENT = Decimal("0.01")
+
+
+def _item_key(descripcion: str, cantidad: int, precio_unitario) -> tuple[str, int, Decimal]:
+    return (descripcion, cantidad, Decimal(str(precio_unitario)).quantize(CENT))
+
+
+def _item_rows(qid: int, items: List[s.QuotationItemIn]) -> tuple[list[dict], Decimal]:
+    # Totales en Decimal, en una sola pasada
+    rows: list[dict] = []
+    subtotal = Decimal(0)
+    for it in items:
+        descripcion, cantidad, precio = _item_key(it.descripcion, it.cantidad, it.precio_unitario)
+        total = (precio * cantidad).quantize(CENT)
+        rows.append({"quotation_id": qid, "descripcion": descripcion, "cantidad": cantidad, "precio_unitario": precio, "total": total})
+        subtotal += total
+    return rows, subtotal
+
+
+def _set_totals(q: mo.Quotation, subtotal: Decimal) -> None:
+    q.subtotal = subtotal
+    q.impuestos = (subtotal * IVA).quantize(CENT)
+    q.total = q.subtotal + q.impuestos
+
 
 @router.post("/cotizaciones", response_model=s.QuotationRead)
 def create_quotation(payload: s.QuotationCreate, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
@@ -23,31 +54,42 @@ def create_quotation(payload: s.QuotationCreate, db: Session = Depends(deps.get_
     db.add(q)
     db.flush()
 
-    items = []
-    subtotal = 0.0
-    for it in payload.items:
-        total = float(it.precio_unitario) * it.cantidad
-        qi = mo.QuotationItem(quotation_id=q.id, descripcion=it.descripcion, cantidad=it.cantidad, precio_unitario=it.precio_unitario, total=total)
-        db.add(qi)
-        items.append(qi)
-        subtotal += total
-
-    q.subtotal = subtotal
-    q.impuestos = subtotal * 0.19
-    q.total = q.subtotal + q.impuestos
+    rows, subtotal = _item_rows(q.id, payload.items)
+    if rows:
+        db.execute(insert(mo.QuotationItem), rows)  # executemany
+    _set_totals(q, subtotal)
 
     db.commit()
     db.refresh(q)
     return q
 
 
-@router.get("/cotizaciones", response_model=List[s.QuotationRead])
-def list_quotations(db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+def _scoped_quotations(db: Session, current):
     q = db.query(mo.Quotation)
     # scope por empresa del usuario (usando la empresa del cliente asociado)
     if current.role != "super_admin":
         q = q.join(Client, mo.Quotation.client_id == Client.id).filter(Client.company_id == current.company_id)
-    return q.order_by(mo.Quotation.id.desc()).all()
+    return q
+
+
+@router.get("/cotizaciones", response_model=List[s.QuotationRead])
+def list_quotations(response: Response, page: int = 1, per_page: int = 20, cursor: str | None = None, stream: bool = False, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+    # items en una sola consulta IN por página (evita 1+N)
+    q = _scoped_quotations(db, current).options(selectinload(mo.Quotation.items))
+    return paginate(q, [(mo.Quotation.id, True)], s.QuotationRead, cursor=cursor, page=page, per_page=per_page, stream=stream, response=response)
+
+
+@router.get("/cotizaciones/resumen", response_model=List[s.QuotationHeaderRead])
+def list_quotation_headers(response: Response, page: int = 1, per_page: int = 20, cursor: str | None = None, stream: bool = False, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+    # solo cabeceras + conteo de ítems (subconsulta correlacionada)
+    items_count = (
+        select(func.count(mo.QuotationItem.id))
+        .where(mo.QuotationItem.quotation_id == mo.Quotation.id)
+        .correlate(mo.Quotation)
+        .scalar_subquery()
+    )
+    q = _scoped_quotations(db, current).options(with_expression(mo.Quotation.items_count, items_count))
+    return paginate(q, [(mo.Quotation.id, True)], s.QuotationHeaderRead, cursor=cursor, page=page, per_page=per_page, stream=stream, response=response)
 
 
 @router.patch("/cotizaciones/{qid}", response_model=s.QuotationRead)
@@ -60,16 +102,31 @@ def update_quotation(qid: int, payload: s.QuotationUpdate, db: Session = Depends
     if payload.notas is not None:
         q.notas = payload.notas
     if payload.items is not None:
-        # reemplazo simple
-        db.query(mo.QuotationItem).filter(mo.QuotationItem.quotation_id == q.id).delete()
-        subtotal = 0.0
-        for it in payload.items:
-            total = float(it.precio_unitario) * it.cantidad
-            db.add(mo.QuotationItem(quotation_id=q.id, descripcion=it.descripcion, cantidad=it.cantidad, precio_unitario=it.precio_unitario, total=total))
-            subtotal += total
-        q.subtotal = subtotal
-        q.impuestos = subtotal * 0.19
-        q.total = q.subtotal + q.impuestos
+        # reemplazo por diferencias: se conservan los ítems idénticos
+        rows, subtotal = _item_rows(q.id, payload.items)
+        pending = Counter(_item_key(r["descripcion"], r["cantidad"], r["precio_unitario"]) for r in rows)
+        stale_ids: list[int] = []
+        existing = db.execute(
+            select(mo.QuotationItem.id, mo.QuotationItem.descripcion, mo.QuotationItem.cantidad, mo.QuotationItem.precio_unitario)
+            .where(mo.QuotationItem.quotation_id == q.id)
+        ).all()
+        for item_id, descripcion, cantidad, precio in existing:
+            key = _item_key(descripcion, cantidad, precio)
+            if pending[key] > 0:
+                pending[key] -= 1
+            else:
+                stale_ids.append(item_id)
+        new_rows = []
+        for r in rows:
+            key = _item_key(r["descripcion"], r["cantidad"], r["precio_unitario"])
+            if pending[key] > 0:
+                pending[key] -= 1
+                new_rows.append(r)
+        if stale_ids:
+            db.execute(delete(mo.QuotationItem).where(mo.QuotationItem.id.in_(stale_ids)))
+        if new_rows:
+            db.execute(insert(mo.QuotationItem), new_rows)
+        _set_totals(q, subtotal)
     db.commit()
     db.refresh(q)
     return q
@@ -80,6 +137,12 @@ def calculate_price(payload: s.PricingRequest, db: Session = Depends(deps.get_db
     return PricingService.calculate_total(db, **payload.dict())
 
 
+@router.post("/pricing/calculate:batch", response_model=s.PricingBatchRead)
+def calculate_price_batch(payload: s.PricingBatchRequest, db: Session = Depends(deps.get_db), _: object = Depends(deps.get_current_user)):
+    rows = [it.dict() for it in payload.items]
+    return s.PricingBatchRead(items=PricingService.calculate_batch(db, rows))
+
+
 @router.post("/cotizaciones/{qid}/convertir", response_model=s.ServiceOrderRead)
 def convert_to_order(qid: int, payload: s.ServiceOrderCreate, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
     q = db.query(mo.Quotation).get(qid)
@@ -104,6 +167,7 @@ def convert_to_order(qid: int, payload: s.ServiceOrderCreate, db: Session = Depe
     db.add(order)
     db.commit()
     db.refresh(order)
+    DashboardService.invalidate(order.company_id)
     return order
 
 
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List
 
 from app.core import deps
+from app.core.pagination import paginate
 from app.core.security import PasswordHelper
 from app.models.user import User
 from app.schemas.user import UserRead, UserCreate, UserUpdate
@@ -11,34 +13,39 @@ router = APIRouter()
 
 
 @router.post("", response_model=UserRead)
-def create_user(payload: UserCreate, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+async def create_user(payload: UserCreate, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
     # admin solo en su empresa; super_admin puede en cualquiera
     if current.role != "super_admin":
         payload.company_id = current.company_id
         if payload.role == "super_admin":
             raise HTTPException(status_code=403, detail="No permitido crear super_admin")
-    if db.query(User).filter(User.email == payload.email).one_or_none():
+    # async como login: la consulta va al threadpool y bcrypt al pool de hashing
+    if await run_in_threadpool(lambda: db.query(User).filter(User.email == payload.email).one_or_none()):
         raise HTTPException(status_code=409, detail="Email ya registrado")
-    hashed = PasswordHelper.hash_password(payload.password)
+    hashed = await PasswordHelper.hash_password_async(payload.password)
     assigned_company_id = payload.company_id if current.role == "super_admin" else current.company_id
     user = User(email=payload.email, hashed_password=hashed, role=payload.role, company_id=assigned_company_id)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+
+    def _save() -> User:
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+
+    return await run_in_threadpool(_save)
 
 
 @router.get("", response_model=List[UserRead])
-def list_users(db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+def list_users(response: Response, page: int = 1, per_page: int = 20, cursor: str | None = None, stream: bool = False, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
     q = db.query(User)
     if current.role != "super_admin":
         q = q.filter(User.company_id == current.company_id)
-    return q.order_by(User.id.desc()).all()
+    return paginate(q, [(User.id, True)], UserRead, cursor=cursor, page=page, per_page=per_page, stream=stream, response=response)
 
 
 @router.patch("/{user_id}", response_model=UserRead)
-def update_user(user_id: int, payload: UserUpdate, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
-    user = db.query(User).get(user_id)
+async def update_user(user_id: int, payload: UserUpdate, db: Session = Depends(deps.get_db), current=Depends(deps.get_current_user)):
+    user = await run_in_threadpool(lambda: db.query(User).get(user_id))
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     if current.role != "super_admin":
@@ -52,12 +59,17 @@ def update_user(user_id: int, payload: UserUpdate, db: Session = Depends(deps.ge
     if payload.role is not None:
         user.role = payload.role
     if payload.password:
-        user.hashed_password = PasswordHelper.hash_password(payload.password)
+        user.hashed_password = await PasswordHelper.hash_password_async(payload.password)
     if payload.company_id is not None:
         user.company_id = payload.company_id
-    db.commit()
-    db.refresh(user)
-    return user
+
+    def _save() -> User:
+        db.commit()
+        deps.invalidate_principal(user.email)
+        db.refresh(user)
+        return user
+
+    return await run_in_threadpool(_save)
 
 
 @router.delete("/{user_id}")
@@ -69,6 +81,7 @@ def delete_user(user_id: int, db: Session = Depends(deps.get_db), current=Depend
         raise HTTPException(status_code=403, detail="No permitido")
     db.delete(user)
     db.commit()
+    deps.invalidate_principal(user.email)
     return {"ok": True}
 
 
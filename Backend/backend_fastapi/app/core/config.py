@@ -23,6 +23,53 @@ class Settings(BaseSettings):
     ADMIN_EMAIL: str = "admin@tfc.local"
     ADMIN_PASSWORD: str = "admin123"
 
+    # Caches en memoria (por worker)
+    PRICING_RULES_TTL_SECONDS: float = 30.0
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    PRINCIPAL_CACHE_MAXSIZE: int = 10000
+    DASHBOARD_CACHE_TTL_SECONDS: float = 5.0
+    OPERATOR_PROFILE_TTL_SECONDS: float = 300.0
+    CATALOG_CACHE_TTL_SECONDS: float = 300.0
+    CATALOG_MAX_AGE_SECONDS: int = 60  # Cache-Control para clientes
+
+    # Ingesta masiva de eventos/posiciones
+    EVENT_FLUSH_BATCH_SIZE: int = 500
+    EVENT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    EVENT_QUEUE_MAX: int = 50000
+    # Índice de flota por worker: cada cuánto trae de order_positions las posiciones
+    # escritas por otros workers; es la máxima antigüedad de /ops/vehicles/nearby
+    FLEET_INDEX_SYNC_SECONDS: float = 30.0
+
+    # Archivo de order_events de órdenes completadas
+    EVENT_ARCHIVE_DIR: str = "var/event_archive"
+    EVENT_RETENTION_DAYS: int = 90
+
+    # Auth
+    # Incluir uid/role/company_id en el access token para evitar la consulta a users.
+    # Apagado por defecto: invalidate_principal solo descarta los claims en el worker que
+    # hizo el cambio, así que en los demás un usuario borrado o degradado conserva su rol
+    # hasta ACCESS_TOKEN_EXPIRE_MINUTES. Activar solo con un único worker o tokens cortos.
+    # Sin claims, un cambio tarda como mucho PRINCIPAL_CACHE_TTL_SECONDS en verse.
+    TOKEN_EMBED_CLAIMS: bool = False
+    # Hashing de contraseñas fuera del threadpool: procesos dedicados (0 = un hilo aparte)
+    PASSWORD_HASH_WORKERS: int = 2
+    # Operaciones en cola o en curso a partir de las cuales se responde 503
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Política de hashing: bcrypt | argon2 (requiere argon2-cffi). Los hashes con otro
+    # esquema o menor costo se rehashean en el siguiente login exitoso.
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_MEMORY_KB: int = 65536
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_PARALLELISM: int = 2
+    # >0: al arrancar se calibra el costo (rounds / time_cost) para ~este tiempo por hash
+    PASSWORD_HASH_TARGET_MS: int = 0
+    # Revocación de refresh tokens: Bloom filter en memoria sincronizado con revoked_tokens
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.01
+    REVOCATION_SYNC_SECONDS: float = 30.0  # trae revocaciones hechas en otros workers
+    REVOCATION_SWEEP_SECONDS: float = 3600.0  # purga vencidos y reconstruye el filtro
+
 
 settings = Settings()
 
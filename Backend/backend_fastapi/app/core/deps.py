@@ -1,14 +1,19 @@
-from typing import Generator
+from dataclasses import dataclass
+from typing import Any, Generator
+import threading
+import time
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from sqlalchemy.orm import Session
 
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.security import TokenManager
 from app.db.session import get_session_factory
 from app.models.user import User
-from app.models.auth import RevokedToken
+from app.services.revocation import revocation_list
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
@@ -23,28 +28,81 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+@dataclass(frozen=True)
+class Principal:
+    """Snapshot inmutable del usuario autenticado (no es una entidad ORM)."""
+
+    id: int
+    email: str
+    role: str
+    company_id: int | None = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, email=user.email, role=user.role, company_id=user.company_id)
+
+    def token_claims(self) -> dict[str, Any]:
+        return {"uid": self.id, "role": self.role, "company_id": self.company_id}
+
+
+_principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_MAXSIZE, ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+# email -> instante del último cambio; los claims de tokens emitidos antes se ignoran
+_principal_changed_at: dict[str, float] = {}
+_principal_lock = threading.Lock()
+
+
+def invalidate_principal(email: str) -> None:
+    now = time.time()
+    horizon = now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    with _principal_lock:
+        _principal_changed_at[email] = now
+        for key in [k for k, ts in _principal_changed_at.items() if ts < horizon]:
+            del _principal_changed_at[key]
+    _principal_cache.pop(email)
+
+
+def _principal_from_claims(payload: dict[str, Any]) -> Principal | None:
+    if "uid" not in payload or "role" not in payload:
+        return None
+    email = str(payload["sub"])
+    changed_at = _principal_changed_at.get(email)
+    if changed_at is not None and payload.get("iat", 0) <= changed_at:
+        return None
+    return Principal(id=int(payload["uid"]), email=email, role=str(payload["role"]), company_id=payload.get("company_id"))
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     try:
-        email = TokenManager.decode_access_token(token)
+        payload = TokenManager.decode_access_payload(token)
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
 
-    user = db.query(User).filter(User.email == email).one_or_none()
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no encontrado")
-    return user
+    principal = _principal_from_claims(payload)
+    if principal is not None:
+        return principal
+
+    email = str(payload["sub"])
+    principal = _principal_cache.get(email)
+    if principal is None:
+        user = db.query(User).filter(User.email == email).one_or_none()
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no encontrado")
+        principal = Principal.from_user(user)
+        _principal_cache.set(email, principal)
+    return principal
 
 
 def require_roles(*roles: str):
-    def _checker(current: User = Depends(get_current_user)) -> User:
+    def _checker(current: Principal = Depends(get_current_user)) -> Principal:
         if current.role not in roles:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permisos insuficientes")
         return current
     return _checker
 
 def ensure_refresh_not_revoked(refresh_token: str, db: Session) -> None:
+    # Bloom filter en memoria: el caso común (no revocado) no consulta la base
     token_hash = TokenManager.token_sha256(refresh_token)
-    if db.query(RevokedToken).filter(RevokedToken.token_hash == token_hash).first():
+    if revocation_list.is_revoked(db, token_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revocado")
 
 
@@ -0,0 +1,173 @@
+import asyncio
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+import time
+from typing import Any, Callable
+
+from passlib.context import CryptContext
+
+
+class PasswordHashBusyError(Exception):
+    """Demasiadas operaciones de hashing pendientes; el cliente debe reintentar."""
+
+
+# contexto del proceso/hilo del pool (se arma en el initializer)
+_worker_context: CryptContext | None = None
+
+
+def _init_worker(config: str) -> None:
+    global _worker_context
+    _worker_context = CryptContext.from_string(config)
+
+
+def _hash(plain_password: str) -> str:
+    return _worker_context.hash(plain_password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return _worker_context.verify(plain_password, hashed_password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    # (válida, hash nuevo si el actual no cumple la política vigente)
+    return _worker_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHashPool:
+    """Executor acotado para bcrypt, aparte del threadpool de Starlette.
+
+    Con ``workers > 0`` usa procesos (spawn: no hereda hilos ni conexiones del
+    worker web); con 0, un único hilo dedicado. Si hay ``max_pending``
+    operaciones en cola o en curso, ``submit`` lanza ``PasswordHashBusyError``
+    en vez de encolar más (la API responde 503 + Retry-After). Si un proceso
+    muere el executor queda roto: se descarta, se crea otro y la operación se
+    reintenta una vez.
+    """
+
+    def __init__(self, workers: int, max_pending: int, context_config: Callable[[], str]) -> None:
+        self._workers = workers
+        self._max_pending = max_pending
+        self._context_config = context_config
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    initargs = (self._context_config(),)
+                    if self._workers > 0:
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self._workers,
+                            mp_context=multiprocessing.get_context("spawn"),
+                            initializer=_init_worker,
+                            initargs=initargs,
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password-hash", initializer=_init_worker, initargs=initargs)
+        return self._executor
+
+    def _discard(self, executor: Executor) -> None:
+        # solo el primero que lo detecta lo quita; los demás ya ven el nuevo
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        return self._submit(fn, *args)[1]
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> tuple[Executor, Future]:
+        with self._lock:
+            if self._pending >= self._max_pending:
+                self._rejected += 1
+                raise PasswordHashBusyError()
+            self._pending += 1
+            self._submitted += 1
+        started = time.perf_counter()
+
+        def _done(_: Future) -> None:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._busy_seconds += elapsed
+                self._max_seconds = max(self._max_seconds, elapsed)
+
+        try:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self._discard(executor)
+                executor = self._get_executor()
+                future = executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(_done)
+        return executor, future
+
+    def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        executor, future = self._submit(fn, *args)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._discard(executor)
+            return self.submit(fn, *args).result()
+
+    async def _call_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        executor, future = self._submit(fn, *args)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            self._discard(executor)
+            return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def hash(self, plain_password: str) -> str:
+        return self._call(_hash, plain_password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._call(_verify, plain_password, hashed_password)
+
+    def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return self._call(_verify_and_update, plain_password, hashed_password)
+
+    async def hash_async(self, plain_password: str) -> str:
+        return await self._call_async(_hash, plain_password)
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._call_async(_verify, plain_password, hashed_password)
+
+    async def verify_and_update_async(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await self._call_async(_verify_and_update, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self._workers,
+                "mode": "process" if self._workers > 0 else "thread",
+                "pending": self._pending,
+                "max_pending": self._max_pending,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                # tiempo total por operación (cola + hashing)
+                "avg_ms": round(self._busy_seconds / self._completed * 1000, 1) if self._completed else None,
+                "max_ms": round(self._max_seconds * 1000, 1),
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
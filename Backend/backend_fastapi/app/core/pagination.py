@@ -0,0 +1,129 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Sequence
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import InstrumentedAttribute, Query
+
+from app.db.session import get_session_factory
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+STREAM_BATCH_SIZE = 500
+
+# (columna, descendente)
+SortKey = Sequence[tuple[InstrumentedAttribute, bool]]
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"No serializable en cursor: {type(value).__name__}")
+
+
+def _coerce(col: InstrumentedAttribute, value: Any) -> Any:
+    # fechas viajan como ISO en el cursor
+    try:
+        python_type = col.type.python_type
+    except NotImplementedError:
+        return value
+    if isinstance(value, str) and python_type in (date, datetime):
+        try:
+            return python_type.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":"), default=_json_default).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return values
+
+
+def _after(sort_key: SortKey, values: Sequence[Any]):
+    # (a, b) > (va, vb) expandido para soportar direcciones mixtas
+    values = [_coerce(col, v) for (col, _), v in zip(sort_key, values)]
+    clauses = []
+    for i, (col, desc) in enumerate(sort_key):
+        prefix = [c == v for (c, _), v in zip(sort_key[:i], values[:i])]
+        clauses.append(and_(*prefix, col < values[i] if desc else col > values[i]))
+    return or_(*clauses)
+
+
+def _ordered(query: Query, sort_key: SortKey) -> Query:
+    return query.order_by(*(col.desc() if desc else col.asc() for col, desc in sort_key))
+
+
+def keyset_page(
+    query: Query,
+    sort_key: SortKey,
+    *,
+    cursor: str | None,
+    page: int,
+    per_page: int,
+    response: Response,
+) -> list:
+    """Pagina por cursor (keyset) si se envía ``cursor``; si no, por ``page`` (offset).
+
+    El cursor de la página siguiente se devuelve en la cabecera ``X-Next-Cursor``
+    cuando la página vino completa.
+    """
+    query = _ordered(query, sort_key)
+    if cursor:
+        query = query.filter(_after(sort_key, decode_cursor(cursor, len(sort_key))))
+    else:
+        query = query.offset((page - 1) * per_page)
+    rows = query.limit(per_page).all()
+    if rows and len(rows) == per_page:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, col.key) for col, _ in sort_key])
+    return rows
+
+
+def ndjson_stream(query: Query, sort_key: SortKey, schema: type[BaseModel]) -> StreamingResponse:
+    """Emite todas las filas como NDJSON leyendo por lotes con un cursor del servidor.
+
+    Usa su propia sesión: la de ``get_db`` se cierra antes de que termine el streaming.
+    """
+    query = _ordered(query, sort_key)
+
+    def _lines():
+        session = get_session_factory()()
+        try:
+            for row in query.with_session(session).yield_per(STREAM_BATCH_SIZE):
+                yield schema.model_validate(row).model_dump_json() + "\n"
+        finally:
+            session.close()
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
+def paginate(
+    query: Query,
+    sort_key: SortKey,
+    schema: type[BaseModel],
+    *,
+    cursor: str | None,
+    page: int,
+    per_page: int,
+    stream: bool,
+    response: Response,
+):
+    if stream:
+        return ndjson_stream(query, sort_key, schema)
+    return keyset_page(query, sort_key, cursor=cursor, page=page, per_page=per_page, response=response)
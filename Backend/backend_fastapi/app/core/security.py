@@ -1,30 +1,122 @@
 from datetime import datetime, timedelta, timezone
 from typing import Any
 import hashlib
+import logging
+import math
+import time
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.hashing import PasswordHashPool
+
+
+logger = logging.getLogger("app.security")
+
+PASSWORD_SCHEMES = ("bcrypt", "argon2")
+
+
+def build_password_context(
+    scheme: str | None = None,
+    bcrypt_rounds: int | None = None,
+    argon2_time_cost: int | None = None,
+) -> CryptContext:
+    """CryptContext según la política configurada.
+
+    El esquema elegido va primero y los demás quedan como deprecated (se
+    siguen verificando); ``min_rounds`` (rounds en bcrypt, time_cost en
+    argon2) marca como desactualizados los hashes de menor costo.
+    """
+    scheme = scheme or settings.PASSWORD_HASH_SCHEME
+    if scheme not in PASSWORD_SCHEMES:
+        raise ValueError(f"PASSWORD_HASH_SCHEME inválido: {scheme}")
+    rounds = bcrypt_rounds or settings.PASSWORD_BCRYPT_ROUNDS
+    kwargs: dict[str, Any] = {"bcrypt__default_rounds": rounds, "bcrypt__min_rounds": rounds}
+    schemes = ["bcrypt"]
+    if scheme == "argon2":
+        from passlib.hash import argon2
+
+        if not argon2.has_backend():
+            raise RuntimeError("PASSWORD_HASH_SCHEME=argon2 requiere el paquete argon2-cffi")
+        schemes = ["argon2", "bcrypt"]
+        time_cost = argon2_time_cost or settings.PASSWORD_ARGON2_TIME_COST
+        kwargs.update(
+            argon2__type="ID",
+            argon2__memory_cost=settings.PASSWORD_ARGON2_MEMORY_KB,
+            argon2__time_cost=time_cost,
+            argon2__min_rounds=time_cost,
+            argon2__parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+        )
+    return CryptContext(schemes=schemes, deprecated="auto", **kwargs)
+
+
+def _calibrated_context(target_ms: int) -> CryptContext:
+    # mide un hash barato y escala: bcrypt duplica por round, argon2 crece lineal con time_cost
+    def _ms(ctx: CryptContext) -> float:
+        t0 = time.perf_counter()
+        ctx.hash("calibracion")
+        return max((time.perf_counter() - t0) * 1000, 0.1)
+
+    if settings.PASSWORD_HASH_SCHEME == "argon2":
+        base = _ms(build_password_context(argon2_time_cost=1))
+        time_cost = min(max(round(target_ms / base), 1), 10)
+        logger.info("Hashing calibrado: argon2id time_cost=%d (%.0f ms con 1)", time_cost, base)
+        return build_password_context(argon2_time_cost=time_cost)
+    base = _ms(build_password_context(bcrypt_rounds=10))
+    rounds = min(max(10 + round(math.log2(target_ms / base)), 10), 16)
+    logger.info("Hashing calibrado: bcrypt rounds=%d (%.0f ms con 10)", rounds, base)
+    return build_password_context(bcrypt_rounds=rounds)
 
 
 class PasswordHelper:
-    _context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    _context = build_password_context()
 
+    @staticmethod
+    def configure() -> None:
+        """Aplica la política (y la calibración, si hay objetivo) antes de atender logins."""
+        target = settings.PASSWORD_HASH_TARGET_MS
+        PasswordHelper._context = _calibrated_context(target) if target > 0 else build_password_context()
+        # el pool arma su contexto al crearse; si ya existía, se recrea con la política nueva
+        password_pool.shutdown()
+
+    # bcrypt corre en password_pool; estas llamadas bloquean al hilo que las hace
     @staticmethod
     def hash_password(plain_password: str) -> str:
-        return PasswordHelper._context.hash(plain_password)
+        return password_pool.hash(plain_password)
 
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return PasswordHelper._context.verify(plain_password, hashed_password)
+        return password_pool.verify(plain_password, hashed_password)
+
+    # para endpoints async: no ocupan un hilo del threadpool mientras esperan
+    @staticmethod
+    async def hash_password_async(plain_password: str) -> str:
+        return await password_pool.hash_async(plain_password)
+
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        return await password_pool.verify_async(plain_password, hashed_password)
+
+    @staticmethod
+    async def verify_and_update_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        # hash nuevo solo si la contraseña es válida y el hash actual está desactualizado
+        return await password_pool.verify_and_update_async(plain_password, hashed_password)
+
+
+password_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    context_config=lambda: PasswordHelper._context.to_string(),
+)
 
 
 class TokenManager:
     @staticmethod
-    def _create_token(subject: str, expires_delta: timedelta, token_type: str) -> str:
+    def _create_token(subject: str, expires_delta: timedelta, token_type: str, claims: dict[str, Any] | None = None) -> str:
         now = datetime.now(timezone.utc)
         payload: dict[str, Any] = {
+            **(claims or {}),
             "sub": subject,
             "iat": int(now.timestamp()),
             "exp": int((now + expires_delta).timestamp()),
@@ -33,8 +125,9 @@ class TokenManager:
         return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
     @staticmethod
-    def create_access_token(subject: str, expires_delta: timedelta) -> str:
-        return TokenManager._create_token(subject, expires_delta, token_type="access")
+    def create_access_token(subject: str, expires_delta: timedelta, claims: dict[str, Any] | None = None) -> str:
+        # claims opcionales (uid, role, company_id) permiten autenticar sin consultar users
+        return TokenManager._create_token(subject, expires_delta, token_type="access", claims=claims)
 
     @staticmethod
     def create_refresh_token(subject: str, expires_delta: timedelta) -> str:
@@ -42,21 +135,29 @@ class TokenManager:
 
     @staticmethod
     def decode_access_token(token: str) -> str:
+        return str(TokenManager.decode_access_payload(token)["sub"])  # email
+
+    @staticmethod
+    def decode_access_payload(token: str) -> dict[str, Any]:
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
             if payload.get("type") != "access":
                 raise JWTError("Invalid token type")
-            return str(payload["sub"])  # email
+            return payload
         except JWTError as exc:  # pragma: no cover - mapped to HTTP layer
             raise exc
 
     @staticmethod
     def decode_refresh_token(token: str) -> str:
+        return str(TokenManager.decode_refresh_payload(token)["sub"])  # email
+
+    @staticmethod
+    def decode_refresh_payload(token: str) -> dict[str, Any]:
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
             if payload.get("type") != "refresh":
                 raise JWTError("Invalid token type")
-            return str(payload["sub"])  # email
+            return payload
         except JWTError as exc:  # pragma: no cover
             raise exc
 
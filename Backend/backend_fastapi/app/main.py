@@ -1,15 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from pathlib import Path
 import time
 from app.core.config import settings
 from app.db.base import Base
 from app.db.session import engine, get_session_factory
-from app.core.security import PasswordHelper
+from app.core.security import PasswordHelper, password_pool
+from app.core.hashing import PasswordHashBusyError
 from app.models.user import User
 from sqlalchemy.orm import Session
 from sqlalchemy import inspect
 from app.services.seed import seed_admin_user, seed_catalogs
+from app.services.revocation import revocation_list
+from app.services.tracking import event_ingestor
 from alembic.config import Config as AlembicConfig
 from alembic import command as alembic_command
 
@@ -26,6 +30,7 @@ logger = logging.getLogger("app")
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    PasswordHelper.configure()
     # Solo realizar seed en dev si las tablas ya existen (Alembic administra el esquema)
     if settings.APP_ENV != "production":
         logger.info("Lifespan start - env=dev")
@@ -39,7 +44,12 @@ async def lifespan(_: FastAPI):
         with session_factory() as db:  # type: ignore
             _seed_if_possible(db)
             logger.info("Seeding done (admin/catalogs)")
+    event_ingestor.start()
+    revocation_list.start()
     yield
+    revocation_list.stop()
+    event_ingestor.stop()
+    password_pool.shutdown()
     logger.info("Lifespan shutdown")
 
 
@@ -73,6 +83,12 @@ def healthcheck() -> dict:
 app.include_router(api_router, prefix="/api/v1")
 
 
+@app.exception_handler(PasswordHashBusyError)
+async def _password_hash_busy(_: Request, __: PasswordHashBusyError) -> JSONResponse:
+    # backpressure del pool de hashing: mejor rechazar rápido que encolar sin límite
+    return JSONResponse(status_code=503, content={"detail": "Servicio ocupado, reintente"}, headers={"Retry-After": "1"})
+
+
 def _run_alembic_upgrade_head() -> None:
     backend_root = Path(__file__).resolve().parents[1]
     cfg_path = backend_root / "alembic.ini"
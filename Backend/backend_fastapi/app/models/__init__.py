@@ -10,8 +10,8 @@ from .catalogs import (
 )  # noqa: F401
 from .crm import Client, Lead, Opportunity  # noqa: F401
 from .pricing import PricingRule  # noqa: F401
-from .orders import Quotation, QuotationItem, ServiceOrder  # noqa: F401
-from .ops import Ally, Vehicle, Operator, Assignment, OrderEvent  # noqa: F401
+from .orders import Quotation, QuotationItem, ServiceOrder, CompanyOrderStats  # noqa: F401
+from .ops import Ally, Vehicle, Operator, Assignment, OrderEvent, OrderPosition, OrderEventArchive  # noqa: F401
 from .hseq import EmployeeDoc, Induction, PreOpInspection, HseqEvent  # noqa: F401
 from .auth import RevokedToken  # noqa: F401
 from .company import Company  # noqa: F401
@@ -1,10 +1,18 @@
+from datetime import datetime, timezone
+
 from sqlalchemy import String, Integer, ForeignKey, Boolean, Numeric, DateTime, Text
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, relationship, query_expression
 from sqlalchemy.sql import func
 
 from app.db.base import Base
 
 
+def _utcnow() -> datetime:
+    # eventos y posiciones se fechan en UTC desde la app, igual que la ingesta masiva;
+    # now() de la base depende de la zona de la sesión
+    return datetime.now(timezone.utc)
+
+
 class Ally(Base):
     __tablename__ = "allies"
 
@@ -28,6 +36,8 @@ class Vehicle(Base):
     gps_id: Mapped[str | None] = mapped_column(String(60), nullable=True)
     active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     company_id: Mapped[int | None] = mapped_column(ForeignKey("companies.id", ondelete="SET NULL"), nullable=True, index=True)
+    # Solo se carga con with_expression (listado con nombre del tipo)
+    tipo_nombre: Mapped[str | None] = query_expression()
 
 
 class Operator(Base):
@@ -66,4 +76,30 @@ class OrderEvent(Base):
     message: Mapped[str | None] = mapped_column(Text, nullable=True)
     lat: Mapped[Numeric | None] = mapped_column(Numeric(10, 6), nullable=True)
     lng: Mapped[Numeric | None] = mapped_column(Numeric(10, 6), nullable=True)
-    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), default=_utcnow, server_default=func.now())
+
+
+class OrderPosition(Base):
+    """Última posición conocida por orden (upsert en cada evento de ubicación)."""
+
+    __tablename__ = "order_positions"
+
+    order_id: Mapped[int] = mapped_column(ForeignKey("service_orders.id", ondelete="CASCADE"), primary_key=True)
+    lat: Mapped[Numeric] = mapped_column(Numeric(10, 6), nullable=False)
+    lng: Mapped[Numeric] = mapped_column(Numeric(10, 6), nullable=False)
+    message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    event_id: Mapped[int | None] = mapped_column(Integer, nullable=True)  # null si vino de la ingesta masiva
+    recorded_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), default=_utcnow, server_default=func.now())
+
+
+class OrderEventArchive(Base):
+    """Índice de eventos archivados en frío (un archivo comprimido por orden)."""
+
+    __tablename__ = "order_event_archives"
+
+    order_id: Mapped[int] = mapped_column(ForeignKey("service_orders.id", ondelete="CASCADE"), primary_key=True)
+    path: Mapped[str] = mapped_column(String(300), nullable=False)  # relativo a EVENT_ARCHIVE_DIR
+    events: Mapped[int] = mapped_column(Integer, nullable=False)
+    first_event_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_event_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    archived_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -1,10 +1,14 @@
-from sqlalchemy import String, Integer, ForeignKey, Numeric, DateTime, Text
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, ForeignKey, Numeric, DateTime, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship, query_expression
 from sqlalchemy.sql import func
 
 from app.db.base import Base
 
 
+# estados en los que la orden ya no ocupa vehículo ni operador
+ESTADOS_CERRADOS = ("completado", "cancelado")
+
+
 class Quotation(Base):
     __tablename__ = "quotations"
 
@@ -22,6 +26,8 @@ class Quotation(Base):
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     items: Mapped[list["QuotationItem"]] = relationship(back_populates="quotation", cascade="all,delete-orphan")
+    # Solo se carga con with_expression (listado de cabeceras)
+    items_count: Mapped[int | None] = query_expression()
 
 
 class QuotationItem(Base):
@@ -48,3 +54,15 @@ class ServiceOrder(Base):
     ruta_destino: Mapped[str | None] = mapped_column(String(160), nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     company_id: Mapped[int | None] = mapped_column(ForeignKey("companies.id", ondelete="SET NULL"), nullable=True, index=True)
+
+
+class CompanyOrderStats(Base):
+    """Contador de órdenes por (empresa, estado), mantenido en la misma transacción que las órdenes."""
+
+    __tablename__ = "company_order_stats"
+    __table_args__ = (UniqueConstraint("company_id", "estado", name="uq_company_order_stats_company_estado"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    company_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # 0 = sin empresa
+    estado: Mapped[str] = mapped_column(String(20), nullable=False)
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
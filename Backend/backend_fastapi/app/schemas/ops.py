@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 
 class AllyCreate(BaseModel):
@@ -70,9 +71,37 @@ class AssignmentRead(AssignmentCreate):
         from_attributes = True
 
 
+class AssignmentBulkCreate(BaseModel):
+    assignments: List[AssignmentCreate] = Field(..., max_length=2000)
+
+
+class AssignmentBulkResult(BaseModel):
+    created: int
+    order_ids: List[int]
+    company_inferred: int = 0
+
+
+class DispatchRequest(BaseModel):
+    turno: str
+    horas_por_orden: int = Field(8, ge=1)
+    max_horas_conduccion: int = Field(48, ge=1)  # tope por operador sumando sus asignaciones abiertas
+    commit: bool = False  # False = solo vista previa
+
+
+class DispatchUnassigned(BaseModel):
+    order_id: int
+    reason: str
+
+
+class DispatchResult(BaseModel):
+    assignments: List[AssignmentCreate]
+    unassigned: List[DispatchUnassigned]
+    committed: bool = False
+
+
 class OrderEventCreate(BaseModel):
     order_id: int
-    tipo: str
+    tipo: str = Field(..., max_length=40)
     message: Optional[str] = None
     lat: Optional[float] = None
     lng: Optional[float] = None
@@ -83,3 +112,45 @@ class OrderEventRead(OrderEventCreate):
 
     class Config:
         from_attributes = True
+
+
+class OrderPositionRead(BaseModel):
+    order_id: int
+    lat: float
+    lng: float
+    message: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class VehicleNearbyRead(BaseModel):
+    vehicle_id: int
+    placa: str
+    tipo_id: Optional[int] = None
+    propio: bool = True
+    ally_id: Optional[int] = None
+    operator_id: Optional[int] = None
+    operator_nombre: Optional[str] = None
+    order_id: int  # orden de la que proviene la última posición
+    lat: float
+    lng: float
+    distance_km: float
+    recorded_at: Optional[datetime] = None
+
+
+class OrderTrackRead(BaseModel):
+    order_id: int
+    estado: str
+    raw_points: int
+    points: int
+    polyline: str  # Google Encoded Polyline (precisión 5)
+
+
+class OrderEventBulkCreate(BaseModel):
+    events: List[OrderEventCreate] = Field(..., max_length=5000)
+
+
+class OrderEventBulkResult(BaseModel):
+    accepted: int
+    rejected_order_ids: List[int] = []
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 
 
@@ -33,7 +33,7 @@ class QuotationItemRead(BaseModel):
         from_attributes = True
 
 
-class QuotationRead(BaseModel):
+class QuotationBaseRead(BaseModel):
     id: int
     client_id: int
     lead_id: Optional[int]
@@ -43,12 +43,19 @@ class QuotationRead(BaseModel):
     impuestos: float
     total: float
     notas: Optional[str]
-    items: List[QuotationItemRead] = []
 
     class Config:
         from_attributes = True
 
 
+class QuotationRead(QuotationBaseRead):
+    items: List[QuotationItemRead] = []
+
+
+class QuotationHeaderRead(QuotationBaseRead):
+    items_count: int = 0
+
+
 class PricingRequest(BaseModel):
     tipo_servicio: str
     distancia_km: float
@@ -58,6 +65,20 @@ class PricingRequest(BaseModel):
     urgente: Optional[bool] = None
 
 
+class PricingResult(BaseModel):
+    subtotal: float
+    impuestos: float
+    total: float
+
+
+class PricingBatchRequest(BaseModel):
+    items: List[PricingRequest] = Field(..., max_length=10000)
+
+
+class PricingBatchRead(BaseModel):
+    items: List[PricingResult]
+
+
 class ServiceOrderCreate(BaseModel):
     quotation_id: int
     ruta_origen: Optional[str] = None
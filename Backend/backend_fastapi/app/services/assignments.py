@@ -0,0 +1,97 @@
+from collections import Counter
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.ops import Ally, Assignment, Operator, Vehicle
+from app.models.orders import ESTADOS_CERRADOS, ServiceOrder
+
+
+def _ids(items: list[dict], key: str) -> set[int]:
+    return {it[key] for it in items if it.get(key) is not None}
+
+
+class AssignmentService:
+    @staticmethod
+    def validate(db: Session, items: list[dict]) -> tuple[dict[int, ServiceOrder], dict[int, int | None], list[dict]]:
+        """Valida un lote de asignaciones con una consulta ``IN`` por tabla.
+
+        Devuelve (órdenes por id, company_id por vehículo, errores). Un vehículo u
+        operador no puede quedar en dos órdenes activas del mismo turno.
+        """
+        errors: list[dict] = []
+
+        def _err(i: int, detail: str) -> None:
+            errors.append({"index": i, "order_id": items[i]["order_id"], "detail": detail})
+
+        orders = {o.id: o for o in db.query(ServiceOrder).filter(ServiceOrder.id.in_(_ids(items, "order_id")))}
+        vehicles = dict(db.execute(select(Vehicle.id, Vehicle.company_id).where(Vehicle.id.in_(_ids(items, "vehicle_id")))).all())
+        operators = set(db.scalars(select(Operator.id).where(Operator.id.in_(_ids(items, "operator_id")))))
+        allies = set(db.scalars(select(Ally.id).where(Ally.id.in_(_ids(items, "ally_id")))))
+
+        repeated = Counter(it["order_id"] for it in items)
+        for i, it in enumerate(items):
+            if it["order_id"] not in orders:
+                _err(i, "Orden no encontrada")
+            elif repeated[it["order_id"]] > 1:
+                _err(i, "Orden repetida en el lote")
+            if it.get("vehicle_id") is not None and it["vehicle_id"] not in vehicles:
+                _err(i, "Vehículo no encontrado")
+            if it.get("operator_id") is not None and it["operator_id"] not in operators:
+                _err(i, "Operador no encontrado")
+            if it.get("ally_id") is not None and it["ally_id"] not in allies:
+                _err(i, "Aliado no encontrado")
+
+        # doble reserva: dentro del lote y contra la asignación vigente de otras órdenes
+        turnos = {it["turno"] for it in items if it.get("turno")}
+        if turnos:
+            latest = select(func.max(Assignment.id)).group_by(Assignment.order_id)
+            booked = db.execute(
+                select(Assignment.order_id, Assignment.vehicle_id, Assignment.operator_id, Assignment.turno)
+                .join(ServiceOrder, ServiceOrder.id == Assignment.order_id)
+                .where(
+                    Assignment.id.in_(latest),
+                    Assignment.turno.in_(turnos),
+                    ServiceOrder.estado.notin_(ESTADOS_CERRADOS),
+                    ServiceOrder.id.notin_(set(repeated)),
+                    (Assignment.vehicle_id.in_(_ids(items, "vehicle_id"))) | (Assignment.operator_id.in_(_ids(items, "operator_id"))),
+                )
+            ).all()
+            taken: dict[tuple[str, int, str], int] = {}
+            for order_id, vehicle_id, operator_id, turno in booked:
+                if vehicle_id is not None:
+                    taken[("vehículo", vehicle_id, turno)] = order_id
+                if operator_id is not None:
+                    taken[("operador", operator_id, turno)] = order_id
+            for i, it in enumerate(items):
+                if not it.get("turno"):
+                    continue
+                for kind, key in (("vehículo", "vehicle_id"), ("operador", "operator_id")):
+                    if it.get(key) is None:
+                        continue
+                    slot = (kind, it[key], it["turno"])
+                    if slot in taken:
+                        _err(i, f"El {kind} {it[key]} ya está asignado a la orden {taken[slot]} en el turno {it['turno']}")
+                    else:
+                        taken[slot] = it["order_id"]
+        return orders, vehicles, sorted(errors, key=lambda e: e["index"])
+
+    @staticmethod
+    def create_bulk(db: Session, items: list[dict]) -> tuple[list[dict], dict[int, int]]:
+        """Valida e inserta un lote de asignaciones; no hace commit.
+
+        Devuelve (errores, company_id inferido por orden). Si hay errores no escribe nada.
+        """
+        orders, vehicles, errors = AssignmentService.validate(db, items)
+        if errors:
+            return errors, {}
+        inferred: dict[int, int] = {}
+        for it in items:
+            order = orders[it["order_id"]]
+            # como en assign_order: la orden sin company toma la del vehículo
+            if order.company_id is None and vehicles.get(it.get("vehicle_id")) is not None:
+                order.company_id = vehicles[it["vehicle_id"]]
+                inferred[order.id] = order.company_id
+        db.flush()
+        db.execute(insert(Assignment), items)
+        return [], inferred
@@ -0,0 +1,39 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from hashlib import sha1
+from typing import Callable, Hashable
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class CachedCatalog:
+    etag: str
+    body: bytes
+
+
+class CatalogCache:
+    """JSON ya serializado de los catálogos, por (catálogo, alcance).
+
+    El ETag es un hash del contenido, así que coincide entre workers y reinicios;
+    la invalidación es local al worker y el TTL acota lo que tardan los demás.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self._entries: defaultdict[str, TTLCache] = defaultdict(lambda: TTLCache(maxsize=1024, ttl_seconds=ttl_seconds))
+
+    def get_or_build(self, name: str, scope: Hashable, build: Callable[[], bytes]) -> CachedCatalog:
+        cached = self._entries[name].get(scope)
+        if cached is not None:
+            return cached
+        body = build()
+        cached = CachedCatalog(etag=f'"{name}-{sha1(body).hexdigest()[:20]}"', body=body)
+        self._entries[name].set(scope, cached)
+        return cached
+
+    def invalidate(self, name: str) -> None:
+        self._entries[name].clear()
+
+
+catalog_cache = CatalogCache(ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS)
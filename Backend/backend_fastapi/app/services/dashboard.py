@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.ops import Operator, Vehicle
+from app.models.user import User
+from app.schemas.dashboard import DashboardRead, DashboardCounts
+from app.services.order_stats import OrderStatsService
+
+
+ESTADOS = ("programado", "en_curso", "completado", "cancelado")
+ESTADOS_ACTIVOS = ("programado", "en_curso")
+
+# company_id (None = global) -> DashboardRead
+_cache = TTLCache(maxsize=1024, ttl_seconds=settings.DASHBOARD_CACHE_TTL_SECONDS)
+
+
+class DashboardService:
+    @staticmethod
+    def get(db: Session, company_id: int | None) -> DashboardRead:
+        cached = _cache.get(company_id)
+        if cached is not None:
+            return cached
+        conductores, vehiculos = DashboardService._fleet_counts(db, company_id)
+        por_estado = OrderStatsService.counts(db, company_id)
+        result = DashboardRead(
+            conductores=conductores,
+            vehiculos=vehiculos,
+            ordenes_activas=sum(por_estado.get(e, 0) for e in ESTADOS_ACTIVOS),
+            estados=DashboardCounts(**{e: por_estado.get(e, 0) for e in ESTADOS}),
+            last_updated=datetime.now(timezone.utc).isoformat(),
+        )
+        _cache.set(company_id, result)
+        return result
+
+    @staticmethod
+    def invalidate(company_id: int | None) -> None:
+        # la vista global (super_admin sin company) también incluye esta empresa
+        _cache.pop(company_id)
+        _cache.pop(None)
+
+    @staticmethod
+    def invalidate_all() -> None:
+        _cache.clear()
+
+    @staticmethod
+    def _fleet_counts(db: Session, company_id: int | None) -> tuple[int, int]:
+        # Conductores por company usando join a users
+        q_ops = (
+            select(func.count(Operator.id))
+            .select_from(Operator)
+            .join(User, Operator.user_id == User.id, isouter=True)
+            .where(Operator.rol == "conductor")
+        )
+        q_veh = select(func.count(Vehicle.id))
+        if company_id is not None:
+            q_ops = q_ops.where(User.company_id == company_id)
+            q_veh = q_veh.where(Vehicle.company_id == company_id)
+        row = db.execute(select(q_ops.scalar_subquery(), q_veh.scalar_subquery())).one()
+        return int(row[0]), int(row[1])
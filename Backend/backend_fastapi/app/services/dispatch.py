@@ -0,0 +1,320 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.catalogs import VehicleType
+from app.models.ops import Assignment, Operator, Vehicle
+from app.models.orders import ESTADOS_CERRADOS, Quotation, ServiceOrder
+from app.models.user import User
+
+
+# tipos de vehículo (nombre en minúscula) admitidos por tipo de servicio; sin entrada = cualquiera
+SERVICE_VEHICLE_TYPES = {
+    "liquida": {"cisterna"},
+    "seca": {"sencillo", "doble troque", "tractomula"},
+}
+# categoría mínima de licencia (C1 < C2 < C3) por tipo de vehículo; sin entrada = C1
+REQUIRED_LICENSE = {"sencillo": 1, "doble troque": 2, "tractomula": 3, "cisterna": 3}
+LICENSE_LEVELS = {"C1": 1, "C2": 2, "C3": 3}
+
+# costo relativo de un vehículo de aliado frente a la flota propia
+ALLY_COST = 10
+# intercambios que intenta la reparación local por operador pendiente
+OPERATOR_REPAIR_TRIES = 50
+
+
+def _csv(value: str | None) -> list[str]:
+    return [t.strip() for t in (value or "").split(",") if t.strip()]
+
+
+@dataclass
+class _Order:
+    id: int
+    client_id: int
+    company_id: int | None
+    tipo_servicio: str
+
+
+@dataclass
+class _Vehicle:
+    id: int
+    placa: str
+    type_name: str | None
+    propio: bool
+    ally_id: int | None
+    company_id: int | None
+
+
+@dataclass
+class _Operator:
+    id: int
+    level: int
+    vetos: set[str]
+    blocked_types: set[str]
+    night_blocked: bool
+    hours_left: int
+    primary_vehicle_id: int | None
+    company_id: int | None = None  # del usuario vinculado; None = sin empresa
+
+
+@dataclass
+class DispatchPlan:
+    assignments: list[dict] = field(default_factory=list)
+    unassigned: list[dict] = field(default_factory=list)
+
+
+class DispatchService:
+    """Propuesta de asignación vehículo/operador para las órdenes ``programado``.
+
+    Heurística en dos etapas, ambas voraces (la opción más restringida primero)
+    con una reparación local por intercambio para las que quedan sin asignar:
+
+    1. Orden -> vehículo: tipo de vehículo compatible con el tipo de servicio,
+       misma empresa, libre en el turno; flota propia antes que aliados.
+    2. Vehículo propio -> operador: licencia suficiente, sin veto (placa o
+       ``cliente:<id>``), sin restricción médica para el tipo (o ``nocturno`` en
+       turnos de noche), de la misma empresa que la orden y el vehículo, y con
+       horas de conducción disponibles. Los vehículos de aliados llevan su
+       propio conductor.
+
+    Los vehículos se agrupan en pools intercambiables por sus atributos, así
+    que la etapa 1 crece con órdenes x pools y no con órdenes x vehículos; los
+    operadores se agrupan por nivel de licencia.
+    """
+
+    @staticmethod
+    def plan(
+        db: Session,
+        turno: str,
+        horas_por_orden: int,
+        max_horas_conduccion: int,
+        company_id: int | None = None,
+        all_companies: bool = True,
+    ) -> DispatchPlan:
+        orders, vehicles, operators = DispatchService._load(db, turno, horas_por_orden, max_horas_conduccion, company_id, all_companies)
+        return DispatchService.solve(orders, vehicles, operators, turno, horas_por_orden)
+
+    @staticmethod
+    def _load(db, turno, horas_por_orden, max_horas, company_id, all_companies):
+        latest = select(func.max(Assignment.id)).group_by(Assignment.order_id)
+        dispatched = select(Assignment.order_id).where(Assignment.id.in_(latest), Assignment.vehicle_id != None)  # noqa: E711
+
+        oq = (
+            select(ServiceOrder.id, ServiceOrder.client_id, ServiceOrder.company_id, Quotation.tipo_servicio)
+            .join(Quotation, Quotation.id == ServiceOrder.quotation_id)
+            .where(ServiceOrder.estado == "programado", ServiceOrder.id.notin_(dispatched))
+            .order_by(ServiceOrder.id)
+        )
+        vq = (
+            select(Vehicle.id, Vehicle.placa, VehicleType.name, Vehicle.propio, Vehicle.ally_id, Vehicle.company_id)
+            .outerjoin(VehicleType, VehicleType.id == Vehicle.tipo_id)
+            .where(Vehicle.active)
+        )
+        if not all_companies:
+            oq = oq.where(ServiceOrder.company_id == company_id)
+            vq = vq.where(Vehicle.company_id == company_id)
+        orders = [_Order(*row) for row in db.execute(oq)]
+
+        # asignaciones vigentes de órdenes abiertas: ocupan el turno y consumen horas
+        booked = db.execute(
+            select(Assignment.vehicle_id, Assignment.operator_id, Assignment.turno, Assignment.horas_conduccion)
+            .join(ServiceOrder, ServiceOrder.id == Assignment.order_id)
+            .where(Assignment.id.in_(latest), ServiceOrder.estado.notin_(ESTADOS_CERRADOS))
+        ).all()
+        busy_vehicles = {v for v, _, t, _ in booked if v is not None and t == turno}
+        busy_operators = {o for _, o, t, _ in booked if o is not None and t == turno}
+        hours_used: dict[int, int] = defaultdict(int)
+        for _, o, _, h in booked:
+            if o is not None:
+                hours_used[o] += h or 0
+
+        vehicles = [
+            _Vehicle(vid, placa, (type_name or "").lower() or None, propio, ally_id, cid)
+            for vid, placa, type_name, propio, ally_id, cid in db.execute(vq)
+            if vid not in busy_vehicles
+        ]
+        # la empresa del operador es la de su usuario vinculado (mismo criterio que list_operators)
+        opq = (
+            select(Operator, User.company_id)
+            .outerjoin(User, User.id == Operator.user_id)
+            .where(Operator.active, Operator.rol == "conductor")
+        )
+        if not all_companies:
+            opq = opq.where((User.company_id == company_id) | (Operator.user_id == None))  # noqa: E711
+        night = "noche" in turno.lower()
+        operators = []
+        for op, op_company_id in db.execute(opq):
+            if op.id in busy_operators or max_horas - hours_used[op.id] < horas_por_orden:
+                continue
+            medical = {t.lower() for t in _csv(op.restricciones_medicas)}
+            operators.append(_Operator(
+                id=op.id,
+                level=max((LICENSE_LEVELS.get(t.upper(), 0) for t in _csv(op.licencias)), default=0),
+                vetos={t.upper() for t in _csv(op.vetos)},
+                blocked_types=medical,
+                night_blocked=night and "nocturno" in medical,
+                hours_left=max_horas - hours_used[op.id],
+                primary_vehicle_id=op.primary_vehicle_id,
+                company_id=op_company_id,
+            ))
+        return orders, vehicles, operators
+
+    @staticmethod
+    def solve(orders: list[_Order], vehicles: list[_Vehicle], operators: list[_Operator], turno: str, horas_por_orden: int) -> DispatchPlan:
+        plan = DispatchPlan()
+        vehicle_of = DispatchService._match_vehicles(orders, vehicles)
+        by_id = {o.id: o for o in orders}
+        operator_of = DispatchService._match_operators([(by_id[oid], v) for oid, v in vehicle_of.items() if v.propio], operators)
+        for order in orders:
+            v = vehicle_of.get(order.id)
+            if v is None:
+                plan.unassigned.append({"order_id": order.id, "reason": "Sin vehículo compatible disponible"})
+                continue
+            op_id = operator_of.get(order.id)
+            if v.propio and op_id is None:
+                plan.unassigned.append({"order_id": order.id, "reason": "Sin operador habilitado disponible"})
+                continue
+            plan.assignments.append({
+                "order_id": order.id,
+                "vehicle_id": v.id,
+                "operator_id": op_id,
+                "ally_id": None if v.propio else v.ally_id,
+                "turno": turno,
+                "horas_conduccion": horas_por_orden,
+            })
+        return plan
+
+    @staticmethod
+    def _vehicle_fits(order: _Order, vehicle_key: tuple) -> bool:
+        company_id, type_name, _, _ = vehicle_key
+        if order.company_id is not None and company_id is not None and company_id != order.company_id:
+            return False
+        allowed = SERVICE_VEHICLE_TYPES.get(order.tipo_servicio)
+        return allowed is None or type_name in allowed
+
+    @staticmethod
+    def _match_vehicles(orders: list[_Order], vehicles: list[_Vehicle]) -> dict[int, _Vehicle]:
+        # pools de vehículos intercambiables: (empresa, tipo, propio, aliado)
+        pools: dict[tuple, list[_Vehicle]] = defaultdict(list)
+        for v in vehicles:
+            pools[(v.company_id, v.type_name, v.propio, v.ally_id)].append(v)
+        keys = sorted(pools, key=lambda k: (not k[2], k[1] or "", str(k)))  # propios primero
+        fits_cache: dict[tuple, list[tuple]] = {}
+
+        def _fits(order: _Order) -> list[tuple]:
+            okey = (order.company_id, order.tipo_servicio)
+            if okey not in fits_cache:
+                fits_cache[okey] = [k for k in keys if DispatchService._vehicle_fits(order, k)]
+            return fits_cache[okey]
+
+        demand: dict[tuple, int] = defaultdict(int)
+        for order in orders:
+            for k in _fits(order):
+                demand[k] += 1
+
+        assigned: dict[int, _Vehicle] = {}
+        holder: dict[tuple, list[int]] = defaultdict(list)  # pool -> órdenes que tomaron de él
+        # voraz: primero las órdenes con menos pools compatibles
+        for order in sorted(orders, key=lambda o: len(_fits(o))):
+            free = [k for k in _fits(order) if pools[k]]
+            if not free:
+                continue
+            # más barato y, a igual costo, el pool menos disputado
+            k = min(free, key=lambda k: (0 if k[2] else ALLY_COST, demand[k] - len(pools[k])))
+            assigned[order.id] = pools[k].pop()
+            holder[k].append(order.id)
+
+        # reparación: liberar un vehículo moviendo a otra orden a un pool alternativo
+        by_id = {o.id: o for o in orders}
+        for order in orders:
+            if order.id in assigned:
+                continue
+            for k in _fits(order):
+                moved = False
+                tried: set[tuple] = set()
+                for other_id in holder[k]:
+                    other = by_id[other_id]
+                    if (other.company_id, other.tipo_servicio) in tried:
+                        continue
+                    tried.add((other.company_id, other.tipo_servicio))
+                    alt = [k2 for k2 in _fits(other) if k2 != k and pools[k2]]
+                    if alt:
+                        k2 = min(alt, key=lambda k: 0 if k[2] else ALLY_COST)
+                        assigned[order.id] = assigned[other_id]
+                        assigned[other_id] = pools[k2].pop()
+                        holder[k].remove(other_id)
+                        holder[k].append(order.id)
+                        holder[k2].append(other_id)
+                        moved = True
+                        break
+                if moved:
+                    break
+        return assigned
+
+    @staticmethod
+    def _operator_fits(op: _Operator, order: _Order, vehicle: _Vehicle) -> bool:
+        # un operador con empresa solo conduce órdenes y vehículos de esa empresa
+        if op.company_id is not None and any(c is not None and c != op.company_id for c in (order.company_id, vehicle.company_id)):
+            return False
+        type_name = vehicle.type_name
+        if op.level < REQUIRED_LICENSE.get(type_name, 1) or op.night_blocked:
+            return False
+        if type_name in op.blocked_types:
+            return False
+        return vehicle.placa.upper() not in op.vetos and f"CLIENTE:{order.client_id}" not in op.vetos
+
+    @staticmethod
+    def _match_operators(jobs: list[tuple[_Order, _Vehicle]], operators: list[_Operator]) -> dict[int, int]:
+        # operadores por nivel de licencia; se usa el menor nivel suficiente para
+        # reservar las licencias altas a los vehículos que las exigen
+        # operadores libres por nivel (dict para sacar en O(1))
+        free: dict[int, dict[int, _Operator]] = defaultdict(dict)
+        for op in sorted(operators, key=lambda o: -o.hours_left):
+            free[op.level][op.id] = op
+        levels = sorted(free)
+        primary = {op.primary_vehicle_id: op for op in operators if op.primary_vehicle_id is not None}
+        result: dict[int, int] = {}
+        holder: dict[int, tuple[_Operator, _Order, _Vehicle]] = {}
+
+        def _take(op: _Operator, order: _Order, vehicle: _Vehicle) -> None:
+            free[op.level].pop(op.id, None)
+            result[order.id] = op.id
+            holder[op.id] = (op, order, vehicle)
+
+        def _free_for(order: _Order, vehicle: _Vehicle) -> _Operator | None:
+            need = REQUIRED_LICENSE.get(vehicle.type_name, 1)
+            for level in levels:
+                if level < need:
+                    continue
+                for op in free[level].values():
+                    if DispatchService._operator_fits(op, order, vehicle):
+                        return op
+            return None
+
+        # los de licencia más exigente primero
+        jobs = sorted(jobs, key=lambda j: -REQUIRED_LICENSE.get(j[1].type_name, 1))
+        pending = []
+        for order, vehicle in jobs:
+            op = primary.get(vehicle.id)
+            if op is not None and op.id in free[op.level] and DispatchService._operator_fits(op, order, vehicle):
+                _take(op, order, vehicle)
+                continue
+            op = _free_for(order, vehicle)
+            if op is None:
+                pending.append((order, vehicle))
+            else:
+                _take(op, order, vehicle)
+
+        # reparación: ceder un operador ocupado si su trabajo tiene otro libre
+        for order, vehicle in pending:
+            candidates = [h for h in holder.values() if DispatchService._operator_fits(h[0], order, vehicle)]
+            for op, other_order, other_vehicle in candidates[:OPERATOR_REPAIR_TRIES]:
+                alt = _free_for(other_order, other_vehicle)
+                if alt is None:
+                    continue
+                _take(alt, other_order, other_vehicle)
+                _take(op, order, vehicle)
+                break
+        return result
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import gzip
+import json
+import logging
+import os
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.ops import OrderEvent, OrderEventArchive
+from app.models.orders import ServiceOrder
+
+
+logger = logging.getLogger("app.event_archive")
+
+_COLUMNS = ("id", "tipo", "message", "lat", "lng", "created_at")
+
+# order_id -> lista de eventos ya leídos del archivo
+_archive_cache = TTLCache(maxsize=256, ttl_seconds=3600)
+
+
+def _archive_root() -> Path:
+    return Path(settings.EVENT_ARCHIVE_DIR)
+
+
+def _jsonable(column: str, value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if column in ("lat", "lng") and value is not None:
+        return float(value)
+    return value
+
+
+class EventArchiveService:
+    """Archivo en frío de order_events.
+
+    Los eventos de órdenes completadas sin actividad en ``EVENT_RETENTION_DAYS``
+    se escriben en ``<EVENT_ARCHIVE_DIR>/<AAAA-MM>/order_<id>_<n eventos>.json.gz``
+    en formato columnar (una lista por columna, comprime mucho mejor que filas)
+    y se borran de la tabla caliente. Las lecturas (``list_events``, ``track``)
+    unen ``archived_events`` con lo que quede en la tabla.
+
+    Cada pasada suma eventos, así que escribe un archivo con otro nombre y
+    nunca pisa el que apunta la base: si el commit falla el nuevo se borra y
+    los eventos siguen en la tabla; el anterior se borra tras el commit.
+    """
+
+    @staticmethod
+    def run(db: Session, older_than_days: int | None = None, max_orders: int = 500) -> dict:
+        days = settings.EVENT_RETENTION_DAYS if older_than_days is None else older_than_days
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        last_activity = func.max(OrderEvent.created_at)
+        candidates = db.execute(
+            select(OrderEvent.order_id, last_activity)
+            .join(ServiceOrder, ServiceOrder.id == OrderEvent.order_id)
+            .where(ServiceOrder.estado == "completado")
+            .group_by(OrderEvent.order_id)
+            .having(last_activity < cutoff)
+            .limit(max_orders)
+        ).all()
+        archived_orders = archived_events = 0
+        for order_id, last_at in candidates:
+            try:
+                archived_events += EventArchiveService._archive_order(db, order_id, last_at)
+                archived_orders += 1
+            except Exception:
+                db.rollback()
+                logger.exception("No se pudo archivar eventos de la orden %s", order_id)
+        return {"orders": archived_orders, "events": archived_events, "cutoff": cutoff.isoformat()}
+
+    @staticmethod
+    def _archive_order(db: Session, order_id: int, last_at: datetime) -> int:
+        rows = db.execute(
+            select(*(getattr(OrderEvent, c) for c in _COLUMNS)).where(OrderEvent.order_id == order_id).order_by(OrderEvent.id)
+        ).all()
+        if not rows:
+            return 0
+        record = db.get(OrderEventArchive, order_id)
+        events = EventArchiveService._read(record) if record else []
+        events.extend(dict(zip(_COLUMNS, row)) for row in rows)
+
+        rel_path = Path(f"{last_at:%Y-%m}") / f"order_{order_id}_{len(events)}.json.gz"
+        EventArchiveService._write(rel_path, order_id, events)
+        old_path = record.path if record else None
+        try:
+            if record is None:
+                record = OrderEventArchive(order_id=order_id, path=str(rel_path), events=0, first_event_id=events[0]["id"], last_event_id=0)
+                db.add(record)
+            record.path = str(rel_path)
+            record.events = len(events)
+            # la marca no retrocede aunque la base reutilice ids tras un borrado
+            record.last_event_id = max(record.last_event_id, events[-1]["id"])
+            # solo lo que quedó en el archivo: no un rango, que incluiría filas confirmadas tarde con id menor
+            ids = [row.id for row in rows]
+            for i in range(0, len(ids), 1000):
+                db.execute(delete(OrderEvent).where(OrderEvent.id.in_(ids[i : i + 1000])))
+            db.commit()
+        except Exception:
+            (_archive_root() / rel_path).unlink(missing_ok=True)
+            raise
+        _archive_cache.pop(order_id)
+        if old_path and old_path != str(rel_path):
+            (_archive_root() / old_path).unlink(missing_ok=True)
+        return len(rows)
+
+    @staticmethod
+    def _write(rel_path: Path, order_id: int, events: list[dict]) -> None:
+        path = _archive_root() / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        columns = {c: [_jsonable(c, ev[c]) for ev in events] for c in _COLUMNS}
+        tmp = path.with_suffix(".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+            json.dump({"order_id": order_id, "columns": columns}, fh, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(record: OrderEventArchive) -> list[dict]:
+        cached = _archive_cache.get(record.order_id)
+        if cached is not None:
+            return list(cached)
+        with gzip.open(_archive_root() / record.path, "rt", encoding="utf-8") as fh:
+            columns = json.load(fh)["columns"]
+        events = [dict(zip(_COLUMNS, values)) for values in zip(*(columns[c] for c in _COLUMNS))]
+        _archive_cache.set(record.order_id, events)
+        return list(events)
+
+    @staticmethod
+    def get_record(db: Session, order_id: int) -> OrderEventArchive | None:
+        return db.get(OrderEventArchive, order_id)
+
+    @staticmethod
+    def archived_events(record: OrderEventArchive | None) -> list[dict]:
+        if record is None:
+            return []
+        return [{**ev, "order_id": record.order_id} for ev in EventArchiveService._read(record)]
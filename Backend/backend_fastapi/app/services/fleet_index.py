@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import math
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.ops import Assignment, OrderPosition, Vehicle
+from app.services.geo import M_PER_DEG_LAT, haversine_km
+
+
+# celdas de ~11 km; una consulta de radio r recorre (2r/11 + 1)^2 celdas
+CELL_DEG = 0.1
+
+
+@dataclass(frozen=True)
+class VehiclePosition:
+    vehicle_id: int
+    company_id: int | None
+    order_id: int
+    lat: float
+    lng: float
+    recorded_at: datetime
+
+
+def _cell(lat: float, lng: float) -> tuple[int, int]:
+    return (math.floor(lat / CELL_DEG), math.floor(lng / CELL_DEG))
+
+
+def _utc(dt: datetime) -> datetime:
+    # SQLite devuelve fechas sin zona; se guardan en UTC
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def _latest_vehicle_assignments():
+    # última asignación con vehículo por orden
+    return (
+        select(func.max(Assignment.id))
+        .where(Assignment.vehicle_id != None)  # noqa: E711
+        .group_by(Assignment.order_id)
+    )
+
+
+class FleetIndex:
+    """Índice en memoria (por worker) de la última posición de cada vehículo.
+
+    Se alimenta de los eventos ``ubicacion``: la orden se traduce al vehículo de
+    su última asignación. Las posiciones se guardan en una grilla de celdas de
+    ``CELL_DEG`` grados; ``nearby`` solo mide distancias en las celdas que
+    cubre el radio. Se carga perezosamente desde order_positions.
+
+    Cada worker solo ve al instante los eventos que recibe él; lo escrito por
+    otros workers (y las reasignaciones hechas en ellos) llega con la
+    resincronización incremental, así que una posición tiene como mucho
+    ``sync_seconds`` de atraso.
+    """
+
+    def __init__(self, sync_seconds: float) -> None:
+        self._sync_seconds = sync_seconds
+        self._lock = threading.Lock()
+        self._positions: dict[int, VehiclePosition] = {}
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        # order_id -> (vehicle_id, company_id) o (None, None) si no tiene vehículo
+        self._order_vehicle = TTLCache(maxsize=50000, ttl_seconds=sync_seconds)
+        self._synced_at: datetime | None = None
+        self._next_sync = 0.0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _put(self, pos: VehiclePosition) -> None:
+        with self._lock:
+            prev = self._positions.get(pos.vehicle_id)
+            if prev is not None and _utc(prev.recorded_at) > _utc(pos.recorded_at):
+                return
+            if prev is not None:
+                cell = self._cells.get(_cell(prev.lat, prev.lng))
+                if cell is not None:
+                    cell.discard(pos.vehicle_id)
+                    if not cell:
+                        del self._cells[_cell(prev.lat, prev.lng)]
+            self._positions[pos.vehicle_id] = pos
+            self._cells.setdefault(_cell(pos.lat, pos.lng), set()).add(pos.vehicle_id)
+
+    def ensure_loaded(self, db: Session) -> None:
+        """Carga completa la primera vez; luego, cada ``sync_seconds``, solo las posiciones nuevas."""
+        if time.monotonic() < self._next_sync:
+            return
+        started = datetime.now(timezone.utc)
+        stmt = (
+            select(Assignment.order_id, Assignment.vehicle_id, Vehicle.company_id, OrderPosition.lat, OrderPosition.lng, OrderPosition.recorded_at)
+            .join(Vehicle, Vehicle.id == Assignment.vehicle_id)
+            .join(OrderPosition, OrderPosition.order_id == Assignment.order_id)
+            .where(Assignment.id.in_(_latest_vehicle_assignments()))
+            .order_by(OrderPosition.recorded_at)
+        )
+        if self._synced_at is not None:
+            # traslape de un intervalo: cubre lotes confirmados tarde (recorded_at es la hora de encolado)
+            stmt = stmt.where(OrderPosition.recorded_at >= self._synced_at - timedelta(seconds=self._sync_seconds))
+        for order_id, vehicle_id, company_id, lat, lng, recorded_at in db.execute(stmt).all():
+            self._put(VehiclePosition(vehicle_id, company_id, order_id, float(lat), float(lng), recorded_at))
+        self._synced_at = started
+        self._next_sync = time.monotonic() + self._sync_seconds
+
+    def _resolve(self, db: Session, order_ids: set[int]) -> dict[int, tuple[int | None, int | None]]:
+        resolved = {}
+        missing = set()
+        for oid in order_ids:
+            hit = self._order_vehicle.get(oid)
+            if hit is None:
+                missing.add(oid)
+            else:
+                resolved[oid] = hit
+        if missing:
+            rows = db.execute(
+                select(Assignment.order_id, Assignment.vehicle_id, Vehicle.company_id)
+                .join(Vehicle, Vehicle.id == Assignment.vehicle_id)
+                .where(Assignment.id.in_(_latest_vehicle_assignments().where(Assignment.order_id.in_(missing))))
+            ).all()
+            found = {oid: (vid, cid) for oid, vid, cid in rows}
+            for oid in missing:
+                resolved[oid] = found.get(oid, (None, None))
+                self._order_vehicle.set(oid, resolved[oid])
+        return resolved
+
+    def feed(self, db: Session, events: list[dict]) -> None:
+        """Actualiza posiciones con los eventos ``ubicacion`` de ``events``."""
+        pings = [ev for ev in events if ev.get("tipo") == "ubicacion" and ev.get("lat") is not None and ev.get("lng") is not None]
+        if not pings:
+            return
+        vehicles = self._resolve(db, {ev["order_id"] for ev in pings})
+        now = datetime.now(timezone.utc)
+        for ev in pings:
+            vehicle_id, company_id = vehicles[ev["order_id"]]
+            if vehicle_id is None:
+                continue
+            self._put(VehiclePosition(vehicle_id, company_id, ev["order_id"], float(ev["lat"]), float(ev["lng"]), ev.get("created_at") or now))
+
+    def forget_orders(self, order_ids) -> None:
+        # la asignación cambió: el próximo evento vuelve a resolver el vehículo
+        for oid in order_ids:
+            self._order_vehicle.pop(oid)
+
+    def nearby(self, lat: float, lng: float, radius_km: float, k: int, company_id: int | None = None, all_companies: bool = False) -> list[tuple[VehiclePosition, float]]:
+        """Hasta ``k`` vehículos a ``radius_km`` o menos, del más cercano al más lejano."""
+        dlat = radius_km * 1000 / M_PER_DEG_LAT
+        dlng = dlat / max(math.cos(math.radians(lat)), 0.01)
+        lat0, lng0 = _cell(lat - dlat, lng - dlng)
+        lat1, lng1 = _cell(lat + dlat, lng + dlng)
+        with self._lock:
+            if (lat1 - lat0 + 1) * (lng1 - lng0 + 1) > len(self._cells):
+                ids = [vid for cell in self._cells.values() for vid in cell]
+            else:
+                ids = [vid for i in range(lat0, lat1 + 1) for j in range(lng0, lng1 + 1) for vid in self._cells.get((i, j), ())]
+            candidates = [self._positions[vid] for vid in ids]
+        if not all_companies:
+            candidates = [p for p in candidates if p.company_id == company_id]
+        if not candidates:
+            return []
+        dist = haversine_km(lat, lng, np.fromiter((p.lat for p in candidates), float), np.fromiter((p.lng for p in candidates), float))
+        inside = np.flatnonzero(dist <= radius_km)
+        best = inside[np.argsort(dist[inside], kind="stable")[:k]]
+        return [(candidates[i], float(dist[i])) for i in best]
+
+
+fleet_index = FleetIndex(sync_seconds=settings.FLEET_INDEX_SYNC_SECONDS)
@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+
+
+# metros por grado (aprox. equirectangular, suficiente para tramos de una ruta)
+M_PER_DEG_LAT = 110540.0
+M_PER_DEG_LNG = 111320.0
+EARTH_RADIUS_KM = 6371.0088
+
+
+def simplify_track(points: list[tuple[float, float]], tolerance_m: float) -> list[tuple[float, float]]:
+    """Douglas–Peucker sobre (lat, lng) proyectados a metros; conserva extremos."""
+    n = len(points)
+    if n < 3:
+        return list(points)
+    pts = np.asarray(points, dtype=float)
+    cos_lat = math.cos(math.radians(float(pts[:, 0].mean())))
+    xy = np.column_stack((pts[:, 1] * M_PER_DEG_LNG * cos_lat, pts[:, 0] * M_PER_DEG_LAT))
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        seg = xy[end] - xy[start]
+        rel = xy[start + 1:end] - xy[start]
+        seg_len2 = float(seg @ seg)
+        if seg_len2 == 0.0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            t = np.clip(rel @ seg / seg_len2, 0.0, 1.0)
+            diff = rel - np.outer(t, seg)
+            dist = np.hypot(diff[:, 0], diff[:, 1])
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance_m:
+            k = start + 1 + i
+            keep[k] = True
+            stack.append((start, k))
+            stack.append((k, end))
+    return [points[i] for i in np.flatnonzero(keep)]
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Distancia en km desde (lat, lng) a cada punto de (lats, lngs)."""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def encode_polyline(points: list[tuple[float, float]], precision: int = 5) -> str:
+    """Codifica (lat, lng) en el formato "Encoded Polyline" de Google."""
+    factor = 10 ** precision
+    out: list[str] = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        ilat, ilng = round(lat * factor), round(lng * factor)
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(out)
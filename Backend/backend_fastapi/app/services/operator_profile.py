@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, attributes
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.ops import Operator, Vehicle
+
+
+@dataclass(frozen=True)
+class OperatorProfile:
+    operator_id: int | None = None
+    operator_name: str | None = None
+    operator_licenses: str | None = None
+    vehicle_id: int | None = None
+    vehicle_placa: str | None = None
+
+
+# user_id -> OperatorProfile (vacío si el usuario no es operador)
+_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_MAXSIZE, ttl_seconds=settings.OPERATOR_PROFILE_TTL_SECONDS)
+
+
+class OperatorProfileService:
+    """Perfil usuario -> operador -> vehículo principal, en caché por worker.
+
+    Se invalida al confirmar cambios de ``Operator`` (por usuario) o de
+    ``Vehicle`` (todo, son poco frecuentes) hechos a través del ORM.
+    """
+
+    @staticmethod
+    def get(db: Session, user_id: int) -> OperatorProfile:
+        cached = _cache.get(user_id)
+        if cached is not None:
+            return cached
+        row = db.execute(
+            select(Operator.id, Operator.nombre, Operator.licencias, Vehicle.id, Vehicle.placa)
+            .outerjoin(Vehicle, Vehicle.id == Operator.primary_vehicle_id)
+            .where(Operator.user_id == user_id)
+            .order_by(Operator.id)
+            .limit(1)
+        ).first()
+        profile = OperatorProfile(*row) if row else OperatorProfile()
+        _cache.set(user_id, profile)
+        return profile
+
+    @staticmethod
+    def invalidate(user_id: int) -> None:
+        _cache.pop(user_id)
+
+    @staticmethod
+    def invalidate_all() -> None:
+        _cache.clear()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_profile_changes(session: Session, _flush_context) -> None:
+    changed = (*session.new, *session.dirty, *session.deleted)
+    for obj in changed:
+        if isinstance(obj, Vehicle):
+            session.info["operator_profile_all"] = True
+        elif isinstance(obj, Operator):
+            # el usuario actual y el anterior, si se reasignó
+            hist = attributes.get_history(obj, "user_id")
+            users = {u for u in (*hist.added, *hist.unchanged, *hist.deleted) if u is not None}
+            session.info.setdefault("operator_profile_users", set()).update(users)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_profiles(session: Session) -> None:
+    users = session.info.pop("operator_profile_users", None)
+    if session.info.pop("operator_profile_all", False):
+        OperatorProfileService.invalidate_all()
+    elif users:
+        for user_id in users:
+            OperatorProfileService.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_profile_changes(session: Session) -> None:
+    session.info.pop("operator_profile_users", None)
+    session.info.pop("operator_profile_all", None)
@@ -0,0 +1,110 @@
+from collections import Counter
+
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.orders import CompanyOrderStats, ServiceOrder
+
+
+NO_COMPANY = 0
+_DEFAULT_ESTADO = ServiceOrder.__table__.c.estado.default.arg
+
+
+def _key(company_id: int | None, estado: str | None) -> tuple[int, str]:
+    return (company_id or NO_COMPANY, estado or _DEFAULT_ESTADO)
+
+
+def _previous(obj: ServiceOrder, attr: str):
+    hist = inspect(obj).attrs[attr].history
+    if hist.deleted:
+        return hist.deleted[0]
+    return hist.unchanged[0] if hist.unchanged else getattr(obj, attr)
+
+
+class OrderStatsService:
+    """Contadores por (empresa, estado) de service_orders.
+
+    Se actualizan en el mismo flush que inserta, modifica o borra la orden
+    (convert_to_order, update_order_status, borrados), así que comparten su
+    transacción. ``reconcile`` los reconstruye desde cero y reporta el drift.
+    """
+
+    @staticmethod
+    def counts(db: Session, company_id: int | None) -> dict[str, int]:
+        q = select(CompanyOrderStats.estado, func.sum(CompanyOrderStats.total)).group_by(CompanyOrderStats.estado)
+        if company_id is not None:
+            q = q.where(CompanyOrderStats.company_id == company_id)
+        return {estado: int(n or 0) for estado, n in db.execute(q).all()}
+
+    @staticmethod
+    def apply(db: Session, deltas: Counter) -> None:
+        conn = db.connection()
+        for (company_id, estado), delta in deltas.items():
+            if delta == 0:
+                continue
+            stmt = (
+                update(CompanyOrderStats)
+                .where(CompanyOrderStats.company_id == company_id, CompanyOrderStats.estado == estado)
+                .values(total=CompanyOrderStats.total + delta)
+            )
+            if conn.execute(stmt).rowcount:
+                continue
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(CompanyOrderStats).values(company_id=company_id, estado=estado, total=delta))
+            except IntegrityError:
+                # otra transacción creó la fila primero
+                conn.execute(stmt)
+
+    @staticmethod
+    def reconcile(db: Session) -> list[dict]:
+        # primero el bloqueo y después el conteo, en una transacción nueva: una orden
+        # escrita entre ambos esperaría a este commit en vez de aplicar su delta y
+        # quedar pisada por un conteo viejo. El commit previo evita que el conteo lea
+        # un snapshot (REPEATABLE READ) tomado antes del bloqueo.
+        db.commit()
+        stored = {
+            (row.company_id, row.estado): row.total
+            for row in db.query(CompanyOrderStats).with_for_update().all()
+        }
+        actual = {
+            (company_id, estado): int(n)
+            for company_id, estado, n in db.execute(
+                select(func.coalesce(ServiceOrder.company_id, NO_COMPANY), ServiceOrder.estado, func.count(ServiceOrder.id))
+                .group_by(func.coalesce(ServiceOrder.company_id, NO_COMPANY), ServiceOrder.estado)
+            ).all()
+        }
+        drift = [
+            {"company_id": company_id or None, "estado": estado, "contador": stored.get((company_id, estado), 0), "real": actual.get((company_id, estado), 0)}
+            for company_id, estado in sorted(stored.keys() | actual.keys())
+            if stored.get((company_id, estado), 0) != actual.get((company_id, estado), 0)
+        ]
+        db.execute(CompanyOrderStats.__table__.delete())
+        if actual:
+            db.execute(
+                insert(CompanyOrderStats),
+                [{"company_id": c, "estado": e, "total": n} for (c, e), n in actual.items()],
+            )
+        db.commit()
+        return drift
+
+
+@event.listens_for(Session, "before_flush")
+def _track_order_counters(session: Session, _flush_context, _instances) -> None:
+    deltas: Counter = Counter()
+    for obj in session.new:
+        if isinstance(obj, ServiceOrder):
+            deltas[_key(obj.company_id, obj.estado)] += 1
+    for obj in session.dirty:
+        if isinstance(obj, ServiceOrder) and session.is_modified(obj):
+            old = _key(_previous(obj, "company_id"), _previous(obj, "estado"))
+            new = _key(obj.company_id, obj.estado)
+            if old != new:
+                deltas[old] -= 1
+                deltas[new] += 1
+    for obj in session.deleted:
+        if isinstance(obj, ServiceOrder):
+            deltas[_key(_previous(obj, "company_id"), _previous(obj, "estado"))] -= 1
+    if deltas:
+        OrderStatsService.apply(session, deltas)
@@ -1,20 +1,104 @@
+from dataclasses import dataclass, field
 from decimal import Decimal
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.pricing import PricingRule
 
 
+@dataclass(frozen=True)
+class PricingRuleTable:
+    """Snapshot inmutable de las reglas activas, indexado por (key, applies_to)."""
+
+    version: int = 0
+    coefficients: dict[tuple[str, str], Decimal] = field(default_factory=dict)
+
+    def coeff(self, key: str, tipo_servicio: str) -> Decimal:
+        # La regla específica del tipo de servicio tiene prioridad sobre "all"
+        value = self.coefficients.get((key, tipo_servicio))
+        if value is None:
+            value = self.coefficients.get((key, "all"), Decimal(0))
+        return value
+
+
+class PricingRuleCache:
+    """Tabla de reglas compilada por worker.
+
+    Se carga con una sola consulta y se revalida como máximo cada
+    ``PRICING_RULES_TTL_SECONDS``; la versión solo sube si el contenido cambió.
+    Las escrituras de ``PricingRule`` en este proceso la invalidan al hacer commit.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self._ttl = ttl_seconds
+        self._table = PricingRuleTable()
+        self._checked_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._table.version
+
+    def invalidate(self) -> None:
+        self._checked_at = None
+
+    def get(self, db: Session) -> PricingRuleTable:
+        if not self._is_stale():
+            return self._table
+        with self._lock:
+            if self._is_stale():
+                self._reload(db)
+        return self._table
+
+    def _is_stale(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self._ttl
+
+    def _reload(self, db: Session) -> None:
+        rows = (
+            db.query(PricingRule.key, PricingRule.applies_to, PricingRule.coefficient)
+            .filter(PricingRule.active == True)  # noqa: E712
+            .all()
+        )
+        coefficients = {(key, applies_to): Decimal(coefficient) for key, applies_to, coefficient in rows}
+        if coefficients != self._table.coefficients:
+            self._table = PricingRuleTable(version=self._table.version + 1, coefficients=coefficients)
+        self._checked_at = time.monotonic()
+
+
+rule_cache = PricingRuleCache(settings.PRICING_RULES_TTL_SECONDS)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_pricing_rule_changes(session: Session, _flush_context) -> None:
+    changed = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(obj, PricingRule) for obj in changed):
+        session.info["pricing_rules_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_pricing_rules(session: Session) -> None:
+    if session.info.pop("pricing_rules_changed", False):
+        rule_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pricing_rule_changes(session: Session) -> None:
+    session.info.pop("pricing_rules_changed", None)
+
+
 class PricingService:
     @staticmethod
     def calculate_total(db: Session, tipo_servicio: str, distancia_km: float, peso_ton: float | None = None,
                         es_peligroso: bool | None = None, nocturno: bool | None = None, urgente: bool | None = None) -> dict:
+        rules = rule_cache.get(db)
+
         def coeff(key: str) -> Decimal:
-            rule = (
-                db.query(PricingRule)
-                .filter(PricingRule.key == key, (PricingRule.applies_to == tipo_servicio) | (PricingRule.applies_to == "all"), PricingRule.active == True)  # noqa: E712
-                .one_or_none()
-            )
-            return Decimal(rule.coefficient) if rule else Decimal(0)
+            return rules.coeff(key, tipo_servicio)
 
         base_km = coeff("base_km")  # COP por km
         base = base_km * Decimal(distancia_km)
@@ -34,3 +118,41 @@ class PricingService:
             "impuestos": float(impuestos.quantize(Decimal("0.01"))),
             "total": float(total.quantize(Decimal("0.01"))),
         }
+
+    @staticmethod
+    def calculate_batch(db: Session, rows: list[dict]) -> list[dict]:
+        """Tarifica muchas filas a la vez, agrupando por tipo_servicio y operando con arrays."""
+        rules = rule_cache.get(db)
+        subtotal = np.zeros(len(rows))
+        impuestos = np.zeros(len(rows))
+
+        groups: dict[str, list[int]] = {}
+        for idx, row in enumerate(rows):
+            groups.setdefault(row["tipo_servicio"], []).append(idx)
+
+        for tipo_servicio, idx in groups.items():
+            group = [rows[i] for i in idx]
+
+            def coeff(key: str) -> float:
+                return float(rules.coeff(key, tipo_servicio))
+
+            def column(name: str) -> np.ndarray:
+                return np.array([r.get(name) or 0 for r in group], dtype=float)
+
+            sub = (
+                coeff("base_km") * column("distancia_km")
+                + coeff("peso_ton") * column("peso_ton")
+                + coeff("riesgo_peligroso") * column("es_peligroso")
+                + coeff("nocturno") * column("nocturno")
+                + coeff("urgente") * column("urgente")
+            )
+            subtotal[idx] = sub
+            impuestos[idx] = sub * coeff("iva_pct") / 100
+
+        total = np.round(subtotal + impuestos, 2)
+        subtotal = np.round(subtotal, 2)
+        impuestos = np.round(impuestos, 2)
+        return [
+            {"subtotal": float(s), "impuestos": float(i), "total": float(t)}
+            for s, i, t in zip(subtotal, impuestos, total)
+        ]
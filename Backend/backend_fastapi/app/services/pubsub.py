@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import threading
+from typing import Protocol
+
+
+logger = logging.getLogger("app.pubsub")
+
+
+class PubSubBackend(Protocol):
+    def subscribe(self, channel: str) -> asyncio.Queue: ...
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue) -> None: ...
+
+    def publish(self, channel: str, message: str) -> None: ...
+
+
+class InMemoryPubSub:
+    """Pub/sub dentro del proceso.
+
+    ``subscribe`` se llama desde el event loop; ``publish`` puede llamarse desde
+    cualquier hilo (los endpoints sync corren en el threadpool). Un suscriptor
+    lento pierde mensajes en vez de frenar a los demás.
+    """
+
+    def __init__(self, queue_size: int = 256) -> None:
+        self._queue_size = queue_size
+        self._subscribers: dict[str, dict[asyncio.Queue, asyncio.AbstractEventLoop]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, {})[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = self._subscribers.get(channel)
+            if subs is None:
+                return
+            subs.pop(queue, None)
+            if not subs:
+                del self._subscribers[channel]
+
+    def publish(self, channel: str, message: str) -> None:
+        with self._lock:
+            targets = list(self._subscribers.get(channel, {}).items())
+        for queue, loop in targets:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, message)
+            except RuntimeError:  # loop cerrado
+                self.unsubscribe(channel, queue)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, message: str) -> None:
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Suscriptor lento: mensaje descartado")
+
+
+_backend: PubSubBackend = InMemoryPubSub()
+
+
+def get_pubsub() -> PubSubBackend:
+    return _backend
+
+
+def set_pubsub(backend: PubSubBackend) -> None:
+    # p.ej. un backend Redis para repartir entre varios workers
+    global _backend
+    _backend = backend
+
+
+def order_channel(order_id: int) -> str:
+    return f"order:{order_id}"
+
+
+def company_channel(company_id: int | None) -> str:
+    return f"company:{company_id or 0}"
@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta, timezone
+import logging
+import math
+import threading
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import get_session_factory
+from app.models.auth import RevokedToken
+
+
+logger = logging.getLogger("app.revocation")
+
+
+class BloomFilter:
+    """Bloom filter sobre hashes sha256 (hex) ya uniformes: sin falsos negativos."""
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, token_hash: str):
+        digest = bytes.fromhex(token_hash)
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, token_hash: str) -> None:
+        for pos in self._positions(token_hash):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, token_hash: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(token_hash))
+
+
+class RevocationList:
+    """Refresh tokens revocados, consultables sin ir a la base en el caso común.
+
+    El Bloom filter responde "no revocado" sin consulta; un positivo se confirma
+    en revoked_tokens (y se recuerda en un set pequeño). Las revocaciones de
+    otros workers llegan con la sincronización incremental cada
+    ``REVOCATION_SYNC_SECONDS``; mientras el filtro no está cargado se consulta
+    siempre la tabla.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._bloom: BloomFilter | None = None
+        self._confirmed: set[str] = set()
+        self._last_id = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._bloom is not None
+
+    def rebuild(self, db: Session) -> int:
+        rows = db.execute(select(RevokedToken.id, RevokedToken.token_hash)).all()
+        bloom = BloomFilter(max(settings.REVOCATION_BLOOM_CAPACITY, 2 * len(rows)), settings.REVOCATION_BLOOM_ERROR_RATE)
+        for _, token_hash in rows:
+            bloom.add(token_hash)
+        with self._lock:
+            self._bloom = bloom
+            self._confirmed = set()
+            self._last_id = max((row_id for row_id, _ in rows), default=0)
+        return len(rows)
+
+    def sync(self, db: Session) -> int:
+        # solo filas nuevas (de este u otros workers) desde la última carga
+        rows = db.execute(select(RevokedToken.id, RevokedToken.token_hash).where(RevokedToken.id > self._last_id)).all()
+        for row_id, token_hash in rows:
+            self.add(token_hash)
+            self._last_id = max(self._last_id, row_id)
+        return len(rows)
+
+    def add(self, token_hash: str) -> None:
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(token_hash)
+            self._confirmed.add(token_hash)
+
+    def is_revoked(self, db: Session, token_hash: str) -> bool:
+        bloom = self._bloom
+        if bloom is not None and token_hash not in bloom:
+            return False
+        if token_hash in self._confirmed:
+            return True
+        revoked = db.scalar(select(RevokedToken.id).where(RevokedToken.token_hash == token_hash)) is not None
+        if revoked:
+            with self._lock:
+                self._confirmed.add(token_hash)
+        return revoked
+
+    def sweep(self, db: Session) -> int:
+        """Borra revocaciones vencidas (ya no hay token válido que bloquear) y reconstruye."""
+        now = datetime.now(timezone.utc)
+        # filas antiguas sin expires_at: ningún refresh token vive más que REFRESH_TOKEN_EXPIRE_DAYS
+        legacy_cutoff = now - timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        result = db.execute(
+            delete(RevokedToken).where(
+                or_(
+                    RevokedToken.expires_at < now,
+                    (RevokedToken.expires_at == None) & (RevokedToken.created_at < legacy_cutoff),  # noqa: E711
+                )
+            )
+        )
+        db.commit()
+        self.rebuild(db)
+        return result.rowcount or 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        try:
+            with get_session_factory()() as db:
+                logger.info("Filtro de revocación cargado: %d tokens", self.rebuild(db))
+        except Exception:
+            logger.exception("No se pudo cargar revoked_tokens; se consultará la tabla")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        last_sweep = datetime.now(timezone.utc)
+        while not self._stop.wait(settings.REVOCATION_SYNC_SECONDS):
+            try:
+                with get_session_factory()() as db:
+                    if (datetime.now(timezone.utc) - last_sweep).total_seconds() >= settings.REVOCATION_SWEEP_SECONDS:
+                        purged = self.sweep(db)
+                        last_sweep = datetime.now(timezone.utc)
+                        logger.info("Revocaciones vencidas purgadas: %d", purged)
+                    elif self.loaded:
+                        self.sync(db)
+                    else:
+                        self.rebuild(db)
+            except Exception:
+                logger.exception("Fallo sincronizando revoked_tokens")
+
+
+revocation_list = RevocationList()
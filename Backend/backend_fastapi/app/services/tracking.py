@@ -0,0 +1,217 @@
+from datetime import datetime, timezone
+import json
+import logging
+import threading
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import get_session_factory
+from app.models.ops import OrderEvent, OrderPosition
+from app.services.fleet_index import fleet_index
+from app.services.pubsub import company_channel, get_pubsub, order_channel
+
+
+logger = logging.getLogger("app.tracking")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+_POSITION_COLUMNS = ("lat", "lng", "message", "event_id", "recorded_at")
+_EVENT_COLUMNS = ("order_id", "tipo", "message", "lat", "lng", "created_at")
+
+
+def insert_events(db: Session, rows: list[dict]) -> list[int]:
+    """Inserta ``rows`` en order_events en un solo viaje y devuelve sus ids en el mismo orden."""
+    dialect = db.get_bind().dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.scalars(insert(OrderEvent).returning(OrderEvent.id, sort_by_parameter_order=True), rows))
+    # MySQL no tiene RETURNING. lastrowid es el id de la primera fila y el resto se
+    # deduce; requiere InnoDB y que a order_events solo lleguen "simple inserts" (nada
+    # de INSERT ... SELECT ni LOAD DATA): así InnoDB reserva el bloque de un INSERT
+    # multi-fila de una vez, sin huecos, con cualquier innodb_autoinc_lock_mode
+    # (0, 1 o 2). El paso sale de @@auto_increment_increment (≠ 1 en réplicas multi-primario).
+    step = db.scalar(text("SELECT @@auto_increment_increment")) or 1
+    first = db.execute(insert(OrderEvent).values(rows)).lastrowid
+    return list(range(first, first + step * len(rows), step))
+
+
+def upsert_positions(db: Session, events: list[dict]) -> None:
+    """Actualiza order_positions con la última ubicación de cada orden en ``events``.
+
+    Solo pisa la fila existente si el evento no es más antiguo que ella: un
+    lote que se escribe tarde no retrocede la posición de la orden.
+    """
+    latest: dict[int, dict] = {}
+    for ev in events:
+        if ev.get("tipo") != "ubicacion" or ev.get("lat") is None or ev.get("lng") is None:
+            continue
+        latest[ev["order_id"]] = {
+            "order_id": ev["order_id"],
+            "lat": ev["lat"],
+            "lng": ev["lng"],
+            "message": ev.get("message"),
+            "event_id": ev.get("id"),
+            "recorded_at": ev.get("created_at") or datetime.now(timezone.utc),
+        }
+    if not latest:
+        return
+    rows = list(latest.values())
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(OrderPosition).values(rows)
+        # MySQL asigna en orden: recorded_at va al final para que la condición vea el valor previo
+        newer = stmt.inserted.recorded_at >= OrderPosition.recorded_at
+        stmt = stmt.on_duplicate_key_update(
+            [(c, func.if_(newer, stmt.inserted[c], OrderPosition.__table__.c[c])) for c in _POSITION_COLUMNS]
+        )
+    else:
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(OrderPosition).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[OrderPosition.order_id],
+            set_={c: stmt.excluded[c] for c in _POSITION_COLUMNS},
+            where=OrderPosition.recorded_at <= stmt.excluded.recorded_at,
+        )
+    db.execute(stmt)
+
+
+def publish_events(events: list[dict], company_by_order: dict[int, int | None]) -> None:
+    """Reparte eventos a los suscriptores en vivo de la orden y de su empresa."""
+    pubsub = get_pubsub()
+    for ev in events:
+        message = json.dumps(
+            {
+                "id": ev.get("id"),
+                "order_id": ev["order_id"],
+                "tipo": ev["tipo"],
+                "message": ev.get("message"),
+                "lat": float(ev["lat"]) if ev.get("lat") is not None else None,
+                "lng": float(ev["lng"]) if ev.get("lng") is not None else None,
+            }
+        )
+        pubsub.publish(order_channel(ev["order_id"]), message)
+        pubsub.publish(company_channel(company_by_order.get(ev["order_id"])), message)
+
+
+class EventIngestor:
+    """Buffer de OrderEvent que un hilo de fondo escribe en micro-lotes.
+
+    Cada lote es un INSERT multi-fila en su propia transacción. Los eventos
+    aún en memoria se pierden si el proceso muere (como máximo
+    ``EVENT_FLUSH_INTERVAL_SECONDS`` de posiciones), por eso solo se usa para
+    la ingesta masiva de posiciones y no para ``add_event``.
+
+    Tras el commit cada evento se publica a los suscriptores en vivo con su id
+    real (por eso los eventos encolados traen ``company_id``).
+
+    Si la base no responde el lote vuelve a la cola; si falla por sus datos se
+    parte en mitades hasta aislar las filas inválidas, que se descartan con un
+    log de error.
+    """
+
+    def __init__(self, batch_size: int, interval_seconds: float, max_pending: int) -> None:
+        self._batch_size = batch_size
+        self._interval = interval_seconds
+        self._max_pending = max_pending
+        self._pending: list[dict] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="order-event-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def enqueue(self, events: list[dict]) -> None:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            if len(self._pending) + len(events) > self._max_pending:
+                raise QueueFullError()
+            self._pending.extend({**ev, "created_at": ev.get("created_at") or now} for ev in events)
+            size = len(self._pending)
+        if size >= self._batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        written = 0
+        while True:
+            with self._lock:
+                batch = self._pending[: self._batch_size]
+                del self._pending[: self._batch_size]
+            if not batch:
+                return written
+            try:
+                written += self._write_isolating(batch)
+            except OperationalError:
+                logger.exception("No se pudo escribir un lote de %d eventos; se reintentará", len(batch))
+                with self._lock:
+                    self._pending[:0] = batch
+                return written
+
+    def _write_isolating(self, batch: list[dict]) -> int:
+        try:
+            self._write(batch)
+            return len(batch)
+        except OperationalError:
+            raise
+        except Exception:
+            if len(batch) == 1:
+                logger.exception("Evento descartado por datos inválidos: %r", batch[0])
+                return 0
+        mid = len(batch) // 2
+        return self._write_isolating(batch[:mid]) + self._write_isolating(batch[mid:])
+
+    def _write(self, batch: list[dict]) -> None:
+        session = get_session_factory()()
+        try:
+            ids = insert_events(session, [{c: ev.get(c) for c in _EVENT_COLUMNS} for ev in batch])
+            batch = [{**ev, "id": event_id} for ev, event_id in zip(batch, ids)]
+            upsert_positions(session, batch)
+            session.commit()
+            # el lote ya está confirmado: un fallo de aquí en adelante no debe reescribirlo
+            try:
+                fleet_index.feed(session, batch)
+            except Exception:
+                logger.exception("No se pudo actualizar el índice de flota")
+            try:
+                publish_events(batch, {ev["order_id"]: ev.get("company_id") for ev in batch})
+            except Exception:
+                logger.exception("No se pudieron publicar %d eventos", len(batch))
+        finally:
+            session.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            self.flush()
+
+
+event_ingestor = EventIngestor(
+    batch_size=settings.EVENT_FLUSH_BATCH_SIZE,
+    interval_seconds=settings.EVENT_FLUSH_INTERVAL_SECONDS,
+    max_pending=settings.EVENT_QUEUE_MAX,
+)
@@ -0,0 +1,45 @@
+"""Throughput de verificación de contraseñas (≈ logins/s) según procesos del pool.
+
+Uso: python -m scripts.bench_password_hashing [--ops 200] [--max-workers N]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import wait
+
+from passlib.context import CryptContext
+
+from app.core.hashing import PasswordHashPool, _verify
+
+
+def run(workers: int, ops: int, config: str, hashed: str) -> float:
+    pool = PasswordHashPool(workers=workers, max_pending=ops, context_config=lambda: config)
+    try:
+        wait([pool.submit(_verify, "secreto", hashed) for _ in range(max(workers, 1))])  # calentar procesos
+        t0 = time.perf_counter()
+        wait([pool.submit(_verify, "secreto", hashed) for _ in range(ops)])
+        return ops / (time.perf_counter() - t0)
+    finally:
+        pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    from app.core.security import PasswordHelper
+
+    context: CryptContext = PasswordHelper._context
+    config = context.to_string()
+    hashed = context.hash("secreto")
+    print(f"CPU: {os.cpu_count()}  ops: {args.ops}")
+    print(f"{'workers':>8} {'logins/s':>10}")
+    for workers in [0, *range(1, args.max_workers + 1)]:
+        label = "hilo" if workers == 0 else str(workers)
+        print(f"{label:>8} {run(workers, args.ops, config, hashed):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Comprueba que subir el costo de hash marca los hashes previos para rehash.
+
+Uso: python -m scripts.check_password_policy [--scheme bcrypt|argon2]
+
+Sin --scheme prueba bcrypt y, si argon2-cffi está instalado, argon2.
+"""
+import argparse
+import sys
+
+from app.core.security import build_password_context
+
+
+def check(scheme: str) -> bool:
+    if scheme == "argon2":
+        try:
+            old, new = build_password_context("argon2", argon2_time_cost=2), build_password_context("argon2", argon2_time_cost=3)
+        except RuntimeError as exc:
+            print(f"argon2: FALLA ({exc})")
+            return False
+    else:
+        old, new = build_password_context("bcrypt", bcrypt_rounds=4), build_password_context("bcrypt", bcrypt_rounds=5)
+    hashed = old.hash("secreto")
+    ok = new.needs_update(hashed) is True and new.needs_update(new.hash("secreto")) is False
+    print(f"{scheme}: {'ok' if ok else 'FALLA'}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], action="append")
+    args = parser.parse_args()
+    schemes = args.scheme
+    if not schemes:
+        from passlib.hash import argon2
+
+        # argon2-cffi es opcional: sin --scheme explícito se omite si no está instalado
+        schemes = ["bcrypt", "argon2"] if argon2.has_backend() else ["bcrypt"]
+        if "argon2" not in schemes:
+            print("argon2: omitido (falta argon2-cffi)")
+    results = [check(scheme) for scheme in schemes]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()